@@ -1,3 +1,90 @@
-from .env import *
-from .model import *
-from .visualization import *
+import importlib
+
+"""
+Evolutionary Computation
+
+Public names are imported from their subpackage on first access (module-level __getattr__),
+so that "import evolutionary_computation" and the core path (Landscape, evolutionary_algorithm)
+never load the plotting stack (matplotlib, scipy) that only visualization needs. For the same
+reason "from evolutionary_computation import *" only imports the env and model names; import
+the visualization names explicitly (e.g. from evolutionary_computation import bootstrap_ci).
+"""
+
+# subpackage -> public names it provides
+_public_names = {
+    "env": ("Landscape",),
+    "model": ("EvolutionaryAlgorithm",
+              "FitnessCache",
+              "FitnessProcessPool",
+              "Individual",
+              "IndividualView",
+              "NoveltyArchive",
+              "NoveltyIndex",
+              "Population",
+              "ResultsStore",
+              "RunRecorder",
+              "Sweep",
+              "allele_counts",
+              "allele_counts_packed",
+              "batch_evolutionary_algorithm",
+              "count_unique_genotypes",
+              "crossover_cut_points",
+              "crossover_mask",
+              "crossover_module",
+              "delta_evaluate_contributions",
+              "evaluate_contributions",
+              "evaluate_genomes",
+              "evolutionary_algorithm",
+              "expand_grid",
+              "function_fingerprint",
+              "get_bits",
+              "get_diversity",
+              "get_novelty",
+              "hamming_distances",
+              "init_fitness_worker",
+              "island_evolutionary_algorithm",
+              "load_checkpoint",
+              "loci_to_mask",
+              "locus_bits",
+              "migration_sources",
+              "mutation_loci",
+              "mutation_mask",
+              "mutation_module",
+              "pack_genomes",
+              "packed_crossover_mask",
+              "packed_length",
+              "popcount",
+              "read_run_log",
+              "save_checkpoint",
+              "stack_draws",
+              "tail_mask",
+              "topologies",
+              "tournament_scores",
+              "tournament_selection_module",
+              "truncation_selection_indices",
+              "truncation_selection_module",
+              "unpack_genomes",
+              "update_archive"),
+    "visualization": ("bootstrap_ci",
+                      "plot_mean_and_bootstrapped_ci_over_time",
+                      "resample_counts"),
+}
+
+_subpackages = {name: subpackage for subpackage, names in _public_names.items() for name in names}
+
+# star-imports stay clear of the plotting stack
+__all__ = sorted(name for name, subpackage in _subpackages.items() if subpackage != "visualization")
+
+
+def __getattr__(name):
+    if name in _public_names:
+        return importlib.import_module("." + name, __name__)
+    if name not in _subpackages:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+    value = getattr(importlib.import_module("." + _subpackages[name], __name__), name)
+    globals()[name] = value # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_subpackages) | set(_public_names))
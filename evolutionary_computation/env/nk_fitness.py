@@ -1,4 +1,7 @@
 import numpy as np
+import hashlib
+import os
+from ..model.modules.bit_packing import get_bits, locus_bits
 
 class Landscape:
     """
@@ -11,6 +14,16 @@ class Landscape:
         self.n = n # genome length
         self.k = k # number of other loci interacting with each gene
         self.gene_contribution_weight_matrix = np.random.rand(n,2**(k+1)) # for each gene, a lookup table for its fitness contribution, which depends on this gene's setting and also the setting of its interacting neighboring loci
+        self.fitness_table = None # fitness of every genome, indexed by packed genome integer (see precompute)
+        self._sorted_fitness_table = None
+        self._build_batch_indices()
+
+    # precompute the lookup structure used by get_fitness_batch
+    def _build_batch_indices(self):
+        self.locus_place_values = 2 ** np.arange(self.n - 1, -1, -1, dtype = np.int64) # genome[0] is the most significant bit of the packed genome integer
+        self.contributing_loci = (np.arange(self.n)[:, None] + np.arange(self.k+1)[None, :]) % self.n # (n, k+1) rolled indices of the interacting loci of each gene (same ordering as get_contributing_gene_values)
+        self.contributing_bit_weights = 2 ** np.arange(self.k, -1, -1) # the first interacting locus is the most significant bit of the lookup index (as in int(..., 2))
+        self.gene_indices = np.arange(self.n)
 
     # find values of interacting loci
     def get_contributing_gene_values(self, genome, gene_num):
@@ -21,8 +34,202 @@ class Landscape:
 
     # find the value of a partiuclar genome
     def get_fitness(self, genome):
+        if self.fitness_table is not None: # O(1) lookup once the landscape is precomputed
+            return float(self.fitness_table[self.genome_to_index(genome)])
         gene_values = np.zeros(self.n) # the value of each gene in the genome
         for gene_num in range(len(genome)): # for each gene
             contributing_gene_values = self.get_contributing_gene_values(genome, gene_num) # get the values of the loci which affect it
             gene_values[gene_num] = self.gene_contribution_weight_matrix[gene_num,int(contributing_gene_values,2)] # use the values of the interacting loci (converted from a binary string to base-10 index) to find the lookup table entry for this combination of genome settings
         return np.mean(gene_values) # define the fitness of the full genome as the average of the contribution of its genes (and return it for use in the evolutionary algoirthm)
+
+    # find the values of a whole population of genomes at once
+    def get_fitness_batch(self, genomes, packed = False):
+        """
+        Vectorized equivalent of get_fitness for a (num_genomes, n) matrix of binary genomes
+
+        parameters:
+        genomes: (numpy array of shape (num_genomes, n)) binary genomes, one per row (uint8 recommended)
+        packed: (bool) whether the genomes are bit-packed uint64 words instead (see pack_genomes)
+
+        returns:
+        fitness: (numpy array of shape (num_genomes,)) fitness of each genome (identical to get_fitness row by row)
+        """
+        genomes = np.asarray(genomes)
+        if genomes.ndim == 1:
+            genomes = genomes[None, :]
+        if self.fitness_table is not None: # O(1) lookup per genome once the landscape is precomputed
+            if packed:
+                indices = self._gene_values(genomes, self.gene_indices, packed = True) @ self.locus_place_values
+                return self.fitness_table[indices].astype(float)
+            return self.fitness_table[self.genome_to_index(genomes)].astype(float)
+        return np.mean(self.get_contributions(genomes, packed), axis = 1)
+
+    # find the values of a whole population of bit-packed genomes at once
+    def get_fitness_packed(self, packed_genomes):
+        return self.get_fitness_batch(packed_genomes, packed = True)
+
+    # values of the given loci of every genome, read straight from the words if the genomes are bit-packed
+    def _gene_values(self, genomes, loci, packed = False):
+        if not packed:
+            return genomes[:, loci].astype(np.int64)
+        return get_bits(genomes, loci).astype(np.int64)
+
+    # find the contribution of every gene of a whole population of genomes
+    def get_contributions(self, genomes, packed = False):
+        """
+        returns:
+        gene_values: (numpy array of shape (num_genomes, n)) fitness contribution of each gene of each genome
+                     (the fitness is their mean)
+        """
+        genomes = np.atleast_2d(genomes)
+        # (num_genomes, n, k+1) values of the interacting loci of every gene
+        contributing_gene_values = self._gene_values(genomes, self.contributing_loci, packed)
+        lookup_indices = contributing_gene_values @ self.contributing_bit_weights # (num_genomes, n)
+        # a single gather of every gene contribution of every genome
+        return self.gene_contribution_weight_matrix[self.gene_indices, lookup_indices]
+
+    # incrementally update cached gene contributions after bit flips
+    def update_contributions(self, genomes, contributions, flipped_loci, packed = False):
+        """
+        Delta evaluation: a flip at locus j only changes the contributions of the k+1 genes
+        j-k, ..., j whose interacting loci contain j, so only those are looked up again (O(K) lookups
+        per flip). The fitness is still the mean over all n contributions, O(N) per genome: keeping a
+        running sum instead would drift from get_fitness_batch as float rounding errors accumulate,
+        while the full mean stays identical to a full evaluation (and is far cheaper than its lookups)
+
+        parameters:
+        genomes: (numpy array of shape (num_genomes, n)) genomes after the flips (bit-packed words if packed)
+        contributions: (numpy array of shape (num_genomes, n)) gene contributions before the flips (updated in place)
+        flipped_loci: (numpy array of shape (num_genomes, num_flips)) loci flipped in each genome
+
+        returns:
+        fitness: (numpy array of shape (num_genomes,)) fitness after the flips (mean of the updated contributions)
+        """
+        genomes = np.atleast_2d(genomes)
+        if len(genomes) == 0:
+            return np.empty(0)
+        flipped_loci = np.asarray(flipped_loci).reshape(len(genomes), -1)
+        # (num_genomes, num_flips * (k+1)) genes affected by the flips (repeated genes are simply looked up twice)
+        affected_genes = ((flipped_loci[:, :, None] - np.arange(self.k+1)) % self.n).reshape(len(genomes), -1)
+        rows = np.arange(len(genomes))[:, None]
+        affected_loci = self.contributing_loci[affected_genes]
+        if packed:
+            # every genome reads its own loci, so the words are gathered row by row (get_bits reads shared loci)
+            words, bits = locus_bits(affected_loci)
+            contributing_gene_values = ((genomes[rows[:, :, None], words] & bits) != 0).astype(np.int64)
+        else:
+            contributing_gene_values = genomes[rows[:, :, None], affected_loci].astype(np.int64)
+        lookup_indices = contributing_gene_values @ self.contributing_bit_weights
+        contributions[rows, affected_genes] = self.gene_contribution_weight_matrix[affected_genes, lookup_indices]
+        return np.mean(contributions, axis = 1)
+
+    # digest of everything fitness depends on (the weights, the interactions and a precomputed table's precision)
+    def fingerprint(self):
+        digest = hashlib.sha1(repr((self.n, self.k, None if self.fitness_table is None else
+                                    str(self.fitness_table.dtype))).encode())
+        digest.update(np.ascontiguousarray(self.gene_contribution_weight_matrix).view(np.uint8))
+        digest.update(np.ascontiguousarray(self.contributing_loci).view(np.uint8))
+        return digest.hexdigest()
+
+    # convert binary genomes to their packed genome integer (index into fitness_table)
+    def genome_to_index(self, genomes):
+        return np.asarray(genomes).astype(np.int64) @ self.locus_place_values
+
+    # convert packed genome integers back to binary genomes
+    def index_to_genome(self, indices):
+        return ((np.asarray(indices)[..., None] & self.locus_place_values) != 0).astype(np.uint8)
+
+    def precompute(self, path = None, dtype = np.float32, max_n = 24, chunk_size = 2**16):
+        """
+        Evaluate every genome of the landscape once; afterwards get_fitness and get_fitness_batch are table lookups
+
+        parameters:
+        path: (string) optional .npy file for the table; loaded memory-mapped if it already exists
+              (so repeated experiments on the same landscape share it), written there otherwise
+        dtype: (numpy dtype) storage type of the table (float32 halves memory; use float64 for exact fitness values)
+        max_n: (int) refuse to enumerate landscapes with more than 2**max_n genomes
+        chunk_size: (int) number of genomes evaluated per vectorized pass
+
+        returns:
+        fitness_table: (numpy array of shape (2**n,)) fitness of every genome, indexed by genome_to_index
+        """
+        if self.n > max_n:
+            raise ValueError("cannot precompute a landscape of 2**" + str(self.n) +
+                             " genomes (max_n = " + str(max_n) + ")")
+        num_genomes = 2 ** self.n
+        self.fitness_table = None # evaluate with the lookup structures, not a stale table
+        self._sorted_fitness_table = None
+
+        if path is not None and os.path.exists(path):
+            fitness_table = np.load(path, mmap_mode = "r")
+            # spot check that the stored table belongs to this landscape
+            check_indices = np.linspace(0, num_genomes - 1, 16).astype(np.int64)
+            if fitness_table.shape != (num_genomes,) or not np.allclose(
+                    fitness_table[check_indices],
+                    self.get_fitness_batch(self.index_to_genome(check_indices)),
+                    rtol = 1e-6):
+                raise ValueError("the table stored at " + path + " does not match this landscape")
+
+        else:
+            fitness_table = np.empty(num_genomes, dtype = dtype)
+            for start in range(0, num_genomes, chunk_size):
+                indices = np.arange(start, min(start + chunk_size, num_genomes))
+                fitness_table[indices] = self.get_fitness_batch(self.index_to_genome(indices))
+
+            if path is not None: # write atomically, then share it memory-mapped
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as filehandler:
+                    np.save(filehandler, fitness_table)
+                os.replace(tmp_path, path)
+                fitness_table = np.load(path, mmap_mode = "r")
+
+        self.fitness_table = fitness_table
+        return fitness_table
+
+    def _get_fitness_table(self):
+        if self.fitness_table is None:
+            raise RuntimeError("the landscape has not been precomputed (call precompute() first)")
+        return self.fitness_table
+
+    def global_optimum(self):
+        """
+        returns:
+        genome: (numpy array) the fittest genome of the landscape
+        fitness: (float) its fitness
+        """
+        fitness_table = self._get_fitness_table()
+        index = np.argmax(fitness_table)
+        return self.index_to_genome(index), float(fitness_table[index])
+
+    def rank_percentile(self, fitness):
+        """
+        Percentage of all genomes whose fitness is lower than or equal to fitness (scalar or array)
+        """
+        if self._sorted_fitness_table is None:
+            self._sorted_fitness_table = np.sort(self._get_fitness_table())
+        rank = np.searchsorted(self._sorted_fitness_table, fitness, side = "right")
+        return 100 * rank / self._sorted_fitness_table.size
+
+    def normalized_distance_to_optimum(self, fitness):
+        """
+        (optimum - fitness) / (optimum - minimum) for a scalar or array of fitness (e.g. fitness_over_time):
+        0 at the global optimum, 1 at the worst genome
+        """
+        fitness_table = self._get_fitness_table()
+        optimum = float(np.max(fitness_table))
+        minimum = float(np.min(fitness_table))
+        return (optimum - np.asarray(fitness)) / (optimum - minimum)
+
+    def count_local_optima(self, chunk_size = 2**16):
+        """
+        Number of genomes that are at least as fit as all of their one-bit-flip neighbours
+        """
+        fitness_table = self._get_fitness_table()
+        num_local_optima = 0
+        for start in range(0, fitness_table.size, chunk_size):
+            indices = np.arange(start, min(start + chunk_size, fitness_table.size))
+            is_local_optimum = np.ones(indices.size, dtype = bool)
+            for place_value in self.locus_place_values:
+                is_local_optimum &= fitness_table[indices] >= fitness_table[indices ^ place_value]
+            num_local_optima += int(np.sum(is_local_optimum))
+        return num_local_optima
@@ -1,2 +1,8 @@
 from .modules import *
 from .evolutionary_algorithm import *
+from .batch_evolutionary_algorithm import *
+from .run_recorder import *
+from .results_store import *
+from .sweep import *
+from .checkpoint import *
+from .island_model import *
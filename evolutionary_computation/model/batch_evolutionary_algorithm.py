@@ -0,0 +1,197 @@
+import numpy as np
+from .modules import *
+
+
+def _batch_novelty(archive, archive_size, genomes, k):
+    """
+    Novelty of every genome of every run against that run's archive
+
+    archive: (numpy array of shape (num_runs, capacity, num_words)) bit-packed archives
+    genomes: (numpy array of shape (num_runs, num_genomes, genome_length)) genomes to be assessed
+    """
+    num_runs, num_genomes = genomes.shape[:2]
+    if archive_size == 0:
+        return np.zeros((num_runs, num_genomes))
+    queries = pack_genomes(genomes)
+    hamming = popcount(queries[:, :, None, :] ^ archive[:, None, :archive_size, :]).sum(axis = -1, dtype = np.int64)
+    k = min(k, archive_size)
+    nearest = np.partition(np.sqrt(hamming), k - 1, axis = -1)[..., :k]
+    return np.mean(nearest, axis = -1)
+
+
+def _batch_update_archive(archive, archive_novelty, archive_size, genomes, novelties):
+    """
+    Add a generation to every run's archive, keeping the most novel genomes once it is full
+    (the same survivors as NoveltyArchive with the "novelty" eviction policy)
+
+    returns:
+    archive_size: (int) new size of the archives (identical across runs)
+    """
+    num_runs, capacity = archive_novelty.shape
+    if capacity == 0:
+        return 0
+    packed = pack_genomes(genomes)
+    num_new = packed.shape[1]
+
+    if archive_size + num_new <= capacity:
+        archive[:, archive_size:archive_size + num_new] = packed
+        archive_novelty[:, archive_size:archive_size + num_new] = novelties
+        return archive_size + num_new
+
+    candidates = np.concatenate((archive[:, :archive_size], packed), axis = 1)
+    candidate_novelty = np.concatenate((archive_novelty[:, :archive_size], novelties), axis = 1)
+    keep = np.argpartition(-candidate_novelty, capacity - 1, axis = 1)[:, :capacity]
+    run_indices = np.arange(num_runs)[:, None]
+    archive[:] = candidates[run_indices, keep]
+    archive_novelty[:] = candidate_novelty[run_indices, keep]
+    return capacity
+
+
+def batch_evolutionary_algorithm(num_runs = 20,
+                                 fitness_function = None,
+                                 batch_fitness_function = None,
+                                 seed = None,
+                                 total_generations = 100,
+                                 num_parents = 10,
+                                 num_children = 10,
+                                 genome_length = 10,
+                                 num_elements_to_mutate = 1,
+                                 mutation_mode = "exact",
+                                 mutation_rate = None,
+                                 crossover = False,
+                                 crossover_ratio = 0.6,
+                                 crossover_mutation_ratio = 0.25,
+                                 crossover_method = "k_point",
+                                 crossover_points = 2,
+                                 downhill_prob = 0.2,
+                                 novelty_selection = True,
+                                 novelty_k = 5,
+                                 novelty_selection_prop = 0,
+                                 max_archive_length = 100,
+                                 diversity_metric = "std",
+                                 diversity_every = 1,
+                                 evaluator = None,
+                                 evaluation_chunk_size = None,
+                                 return_details = False):
+    """
+    Many independent runs of evolutionary_algorithm advanced in lockstep
+
+    The runs share one (num_runs, num_parents + num_children, genome_length) genome tensor:
+    fitness of every run is evaluated in one batch call, and selection, novelty and diversity
+    are computed for all runs per numpy call. Each run draws from its own random stream
+    (spawned from seed) and keeps its own novelty archive (least novel evicted first).
+    Binary genomes with truncation selection and no random restart.
+
+    parameters:
+    num_runs: (int) number of independent runs
+    seed: (int or numpy SeedSequence) root seed of the per-run random streams
+    (see evolutionary_algorithm for the other parameters)
+
+    returns:
+    fitness_over_time: (numpy array of shape (num_runs, total_generations)) top parent fitness of each run at each generation
+    diversity_over_time: (numpy array of shape (num_runs, total_generations)) population genetic diversity of each run at each generation
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    rngs = [np.random.default_rng(stream) for stream in seed.spawn(num_runs)]
+
+    # initialize record keeping
+    fitness_over_time = np.empty((num_runs, total_generations))
+    diversity_over_time = np.empty((num_runs, total_generations))
+
+    if not crossover:
+        crossover_ratio = 0
+        crossover_mutation_ratio = 0
+    if not novelty_selection:
+        max_archive_length = 0
+        novelty_selection_prop = 0
+
+    # per-run novelty archives (every run receives the same number of genomes, so they fill up together)
+    archive = np.zeros((num_runs, max_archive_length, packed_length(genome_length)), dtype = np.uint64)
+    archive_novelty = np.zeros((num_runs, max_archive_length))
+    archive_size = 0
+
+    population_size = num_parents + num_children
+    genomes = np.zeros((num_runs, population_size, genome_length), dtype = np.uint8)
+    fitness = np.zeros((num_runs, population_size))
+    novelty = np.zeros((num_runs, population_size))
+    run_indices = np.arange(num_runs)[:, None]
+
+    def assess(rows):
+        # fitness of every run in one batch call, then novelty against each run's archive
+        nonlocal archive_size
+        flat_genomes = genomes[:, rows].reshape(-1, genome_length)
+        fitness[:, rows] = evaluate_genomes(flat_genomes, fitness_function, batch_fitness_function,
+                                            evaluator, evaluation_chunk_size).reshape(num_runs, len(rows))
+        novelty[:, rows] = _batch_novelty(archive, archive_size, genomes[:, rows], novelty_k)
+        archive_size = _batch_update_archive(archive, archive_novelty, archive_size,
+                                             genomes[:, rows], novelty[:, rows])
+
+    # the initialization proceedure
+    parent_rows = np.arange(num_parents)
+    children_rows = np.arange(num_parents, population_size)
+    genomes[:, parent_rows] = stack_draws(rngs, lambda rng: rng.integers(0, 2, size = (num_parents, genome_length),
+                                                                         dtype = np.uint8))
+    assess(parent_rows)
+
+    crossover_count = int(num_children * crossover_ratio * 0.5)
+    crossover_mutation_count = int(crossover_count * 2 * crossover_mutation_ratio)
+    num_parent_mutants = num_children - crossover_count * 2
+
+    for gen in range(total_generations): # repeat
+        # crossover: sibling pairs written right after the parents
+        if crossover_count != 0:
+            a = stack_draws(rngs, lambda rng: rng.integers(0, num_parents, size = crossover_count))
+            if num_parents > 1:
+                b = (a + stack_draws(rngs, lambda rng: rng.integers(1, num_parents, size = crossover_count))) % num_parents
+            else:
+                b = a
+            mask = stack_draws(rngs, lambda rng: crossover_mask(crossover_count, genome_length,
+                                                                crossover_method, crossover_points, rng))
+            parent_a_genomes = genomes[run_indices, a]
+            parent_b_genomes = genomes[run_indices, b]
+            rows_a = num_parents + 2 * np.arange(crossover_count)
+            genomes[:, rows_a] = np.where(mask, parent_b_genomes, parent_a_genomes)
+            genomes[:, rows_a + 1] = np.where(mask, parent_a_genomes, parent_b_genomes)
+
+        # mutation: crossover children mutated in place, then mutated copies of random parents
+        crossover_mutation_rows = num_parents + stack_draws(
+            rngs, lambda rng: rng.integers(0, max(crossover_count * 2, 1), size = crossover_mutation_count))
+        mutant_parents = stack_draws(rngs, lambda rng: rng.integers(0, num_parents, size = num_parent_mutants))
+        mutant_rows = np.arange(num_parents + crossover_count * 2, population_size)
+        genomes[:, mutant_rows] = genomes[run_indices, mutant_parents]
+
+        rows = np.concatenate((crossover_mutation_rows, np.tile(mutant_rows, (num_runs, 1))), axis = 1)
+        flips = stack_draws(rngs, lambda rng: mutation_mask(rows.shape[1], genome_length,
+                                                            num_elements_to_mutate, mutation_mode,
+                                                            mutation_rate, rng)).astype(np.uint8)
+        np.bitwise_xor.at(genomes, (np.broadcast_to(run_indices, rows.shape), rows), flips)
+
+        # the assessement procedure
+        assess(children_rows)
+
+        # diversity measurement (sampled every diversity_every generations, carried forward in between)
+        if gen % diversity_every == 0:
+            diversity_over_time[:, gen] = get_diversity(genomes, diversity_metric)
+        else:
+            diversity_over_time[:, gen] = diversity_over_time[:, gen - 1]
+
+        # selection, then the survivors become the parents
+        selected_indices = truncation_selection_indices(fitness, novelty, rngs,
+                                                        downhill_prob,
+                                                        num_parents, num_children,
+                                                        novelty_selection_prop)
+        genomes[:, parent_rows] = genomes[run_indices, selected_indices]
+        fitness[:, parent_rows] = fitness[run_indices, selected_indices]
+        novelty[:, parent_rows] = novelty[run_indices, selected_indices]
+
+        # record keeping
+        fitness_over_time[:, gen] = np.max(fitness[:, parent_rows], axis = 1)
+
+    if return_details:
+        best_indices = np.argmax(fitness[:, parent_rows], axis = 1)
+        best_solutions = genomes[np.arange(num_runs), best_indices]
+        best_scores = fitness[np.arange(num_runs), best_indices]
+        return best_solutions, best_scores, fitness_over_time, diversity_over_time
+    else:
+        return fitness_over_time, diversity_over_time
@@ -0,0 +1,24 @@
+import pickle
+import os
+
+
+def save_checkpoint(path, state):
+    """
+    Atomically write the search state of a run (a dict of picklable objects) to path
+
+    The state is written to a temporary file next to path, flushed to disk and then renamed
+    over path, so an interruption never leaves a truncated checkpoint behind.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok = True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as filehandler:
+        pickle.dump(state, filehandler, protocol = pickle.HIGHEST_PROTOCOL)
+        filehandler.flush()
+        os.fsync(filehandler.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as filehandler:
+        return pickle.load(filehandler)
@@ -1,6 +1,575 @@
 import numpy as np
-import copy
+import time
 from .modules import *
+from .checkpoint import save_checkpoint, load_checkpoint
+
+
+class EvolutionaryAlgorithm:
+    """
+    Stepping engine behind evolutionary_algorithm
+
+    The engine holds the whole search state (population, novelty archive, best-so-far and the
+    records) and advances it by one generation per step(). Iterating over it yields the state of
+    each generation lazily until total_generations is reached or an early-stopping criterion
+    (target fitness, stagnation window, wall-clock budget) is met; stop_reason tells which.
+    Hooks can be attached to the end of every phase of a generation, and with profile = True
+    every phase is timed and evaluations are counted (see profile_summary).
+    """
+
+    phases = ("inheritance", "crossover", "mutation", "assessment", "novelty", "diversity", "selection", "record_keeping")
+
+    def __init__(self, fitness_function = None,
+                 total_generations = 100,
+                 num_parents = 10,
+                 num_children = 10,
+                 continuous = False,
+                 genome_length = 10,
+                 packed_genomes = False,
+                 num_elements_to_mutate = 1,
+                 mutation_mode = "exact",
+                 mutation_rate = None,
+                 continuous_mutation = "uniform",
+                 mutation_size_start = 1.0,
+                 mutation_size_end = 0.1,
+                 crossover = False,
+                 crossover_ratio = 0.6,
+                 crossover_mutation_ratio = 0.25,
+                 crossover_method = "k_point",
+                 crossover_points = 2,
+                 restart_every = 0,
+                 downhill_prob = 0.2,
+                 tournament_selection = False,
+                 tournament_size = 4,
+                 num_tournament_winners = 2,
+                 tournament_key = None,
+                 novelty_weight = 0.5,
+                 novelty_selection = True,
+                 novelty_k = 5,
+                 novelty_selection_prop = 0,
+                 max_archive_length = 100,
+                 archive_eviction_policy = "novelty",
+                 diversity_metric = "std",
+                 diversity_every = 1,
+                 batch_fitness_function = None,
+                 packed_fitness_function = None,
+                 evaluator = None,
+                 evaluation_chunk_size = None,
+                 delta_landscape = None,
+                 recorder = None,
+                 checkpoint_path = None,
+                 checkpoint_every = 0,
+                 checkpoint_seconds = 0,
+                 resume_from = None,
+                 target_fitness = None,
+                 stagnation_window = 0,
+                 time_budget = None,
+                 seed = None,
+                 hooks = None,
+                 profile = False):
+        """
+        parameters:
+        (see evolutionary_algorithm)
+        """
+        self.fitness_function = fitness_function
+        self.total_generations = total_generations
+        self.num_parents = num_parents
+        self.num_children = num_children
+        self.continuous = continuous
+        self.genome_length = genome_length
+        self.packed_genomes = packed_genomes
+        self.num_elements_to_mutate = num_elements_to_mutate
+        self.mutation_mode = mutation_mode
+        self.mutation_rate = mutation_rate
+        self.continuous_mutation = continuous_mutation
+        self.mutation_size_start = mutation_size_start
+        self.mutation_size_end = mutation_size_end
+        # crossover
+        if crossover != True:
+            crossover_ratio = 0
+            crossover_mutation_ratio = 0
+        self.crossover_ratio = crossover_ratio
+        self.crossover_mutation_ratio = crossover_mutation_ratio
+        self.crossover_method = crossover_method
+        self.crossover_points = crossover_points
+        self.restart_every = restart_every
+        self.downhill_prob = downhill_prob
+        self.tournament_selection = tournament_selection
+        self.tournament_size = tournament_size
+        self.num_tournament_winners = num_tournament_winners
+        self.tournament_key = tournament_key
+        self.novelty_weight = novelty_weight
+        self.novelty_selection = novelty_selection
+        self.novelty_k = novelty_k
+        self.novelty_selection_prop = novelty_selection_prop
+        self.diversity_metric = diversity_metric
+        self.diversity_every = diversity_every
+        self.diversity = None # last diversity measured
+        self.batch_fitness_function = batch_fitness_function
+        self.packed_fitness_function = packed_fitness_function
+        self.evaluator = evaluator
+        self.evaluation_chunk_size = evaluation_chunk_size
+        self.delta_landscape = delta_landscape
+        self.recorder = recorder
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.target_fitness = target_fitness
+        self.stagnation_window = stagnation_window
+        self.time_budget = time_budget
+
+        # instrumentation (phase boundaries are skipped entirely when neither hooks nor profile are set)
+        self.hooks = {}
+        for phase, phase_hooks in (hooks or {}).items():
+            if phase not in self.phases:
+                raise ValueError("unknown phase " + repr(phase) + ", expected one of " + str(self.phases))
+            self.hooks[phase] = list(phase_hooks) if isinstance(phase_hooks, (list, tuple)) else [phase_hooks]
+        self.profile = profile
+        self.instrumented = profile or len(self.hooks) != 0
+        self.phase_times = dict.fromkeys(self.phases, 0) # nanoseconds spent in each phase
+        self.counters = {"generations": 0,
+                         "fitness_evaluations": 0,
+                         "delta_evaluations": 0,
+                         "deepcopies_avoided": 0}
+        self.fitness_cache = _find_fitness_cache(fitness_function, batch_fitness_function)
+        self.initial_cache_stats = self.fitness_cache.stats() if self.fitness_cache is not None else None
+
+        # own random stream (swapped in while the engine runs), or the global one if None
+        self.random_state = None if seed is None else np.random.RandomState(seed).get_state()
+
+        # initialize record keeping
+        self.fitness_over_time = np.empty(total_generations)
+        self.diversity_over_time = np.empty(total_generations)
+        self.solutions_over_time = []
+
+        # novelty distance archive
+        if not novelty_selection:
+            max_archive_length = 0
+        self.solution_archive = NoveltyArchive(max_archive_length, genome_length, continuous,
+                                               archive_eviction_policy, packed = packed_genomes)
+
+        # the initialization proceedure
+        # rows [0, num_parents) are the parents, the remaining num_children rows are filled every generation
+        self.population = Population(num_parents + num_children, genome_length, continuous, packed = packed_genomes)
+        self.parent_indices = np.arange(num_parents)
+        self.children_indices = np.arange(num_parents, num_parents + num_children)
+
+        # only one best solution and score
+        self.best_solution = None
+        self.best_score = 0
+        self.best_generation = 0
+        self.generation = 0
+        self.stop_reason = None
+
+        # best score seen so far and when it last improved (stagnation window)
+        self.stagnation_score = -np.inf
+        self.last_improvement = 0
+
+        if resume_from is None:
+            outer_state = self._enter_random_state()
+            try:
+                if delta_landscape is not None:
+                    self.population.track_contributions(delta_landscape.n)
+                self._initialize_parents()
+            finally:
+                self._exit_random_state(outer_state)
+
+        else:
+            # continue exactly where the checkpoint left off
+            state = load_checkpoint(resume_from)
+            self.population = state["population"]
+            self.solution_archive = state["solution_archive"]
+            self.best_solution = state["best_solution"]
+            self.best_score = state["best_score"]
+            self.best_generation = state["best_generation"]
+            self.generation = state["generation"]
+            self.fitness_over_time[:self.generation] = state["fitness_over_time"][:self.generation]
+            self.diversity_over_time[:self.generation] = state["diversity_over_time"][:self.generation]
+            self.solutions_over_time = state["solutions_over_time"]
+            if self.generation != 0:
+                self.diversity = self.diversity_over_time[self.generation - 1]
+            self.stagnation_score = state.get("stagnation_score", -np.inf)
+            self.last_improvement = state.get("last_improvement", self.generation)
+            # records logged after the checkpoint are logged again by the resumed run
+            if self.recorder is not None and state.get("num_recorded") is not None:
+                self.recorder.truncate(state["num_recorded"])
+            if self.random_state is None:
+                np.random.set_state(state["random_state"])
+            else:
+                self.random_state = state["random_state"]
+
+        self.start_time = time.perf_counter()
+        self.last_checkpoint_time = self.start_time
+
+    def _enter_random_state(self):
+        if self.random_state is None:
+            return None
+        outer_state = np.random.get_state()
+        np.random.set_state(self.random_state)
+        return outer_state
+
+    def _exit_random_state(self, outer_state):
+        if self.random_state is None:
+            return
+        self.random_state = np.random.get_state()
+        np.random.set_state(outer_state)
+
+    def _phase(self, phase):
+        # close the timer of phase and call its hooks (hooks are not timed)
+        now = time.perf_counter_ns()
+        self.phase_times[phase] += now - self.phase_start
+        for hook in self.hooks.get(phase, ()):
+            hook(self, phase)
+        self.phase_start = time.perf_counter_ns()
+
+    def _evaluate(self, rows):
+        population = self.population
+        if self.profile:
+            self.counters["fitness_evaluations"] += len(rows)
+        if self.delta_landscape is not None:
+            population.fitness[rows] = evaluate_contributions(population, rows, self.delta_landscape)
+        elif population.packed and self.packed_fitness_function is not None and \
+             (not getattr(self.evaluator, "preloaded_fitness", False) or
+              getattr(self.evaluator, "preloaded_packed_fitness", False)):
+            # a pool preloaded with unpacked fitness functions only gets unpacked genomes (below)
+            population.fitness[rows] = evaluate_genomes(population.genomes[rows],
+                                                        None, self.packed_fitness_function,
+                                                        self.evaluator, self.evaluation_chunk_size,
+                                                        packed = True)
+        else:
+            population.fitness[rows] = evaluate_genomes(population.get_genomes(rows),
+                                                        self.fitness_function, self.batch_fitness_function,
+                                                        self.evaluator, self.evaluation_chunk_size)
+
+    def _assess_novelty(self, rows):
+        # the rows are measured against the archive in one batch query, then offered to it
+        population = self.population
+        population.novelty[rows] = get_novelty(self.solution_archive, population.genomes[rows], self.novelty_k)
+        update_archive(self.solution_archive, population.genomes[rows], population.novelty[rows])
+
+    def _initialize_parents(self):
+        self.population.randomize(self.parent_indices)
+        # get population fitness
+        self._evaluate(self.parent_indices)
+        # get population novelty
+        self._assess_novelty(self.parent_indices)
+
+    @property
+    def done(self):
+        return self.stop_reason is not None or self.generation >= self.total_generations
+
+    def step(self):
+        """
+        Run one generation
+
+        returns:
+        state: (dict) generation, best_score, best_solution, best_generation, diversity,
+               archive_size and generation_time of the generation just run
+        """
+        if self.generation >= self.total_generations:
+            raise ValueError("the run already reached total_generations = " + str(self.total_generations))
+        outer_state = self._enter_random_state()
+        try:
+            state = self._step()
+        finally:
+            self._exit_random_state(outer_state)
+
+        # periodic checkpoint of the full search state
+        if self.checkpoint_path is not None and \
+           ((self.checkpoint_every != 0 and self.generation % self.checkpoint_every == 0) or
+            (self.checkpoint_seconds != 0 and time.perf_counter() - self.last_checkpoint_time >= self.checkpoint_seconds)):
+            self.save_checkpoint(self.checkpoint_path)
+
+        self.stop_reason = self._check_stop()
+        return state
+
+    def _step(self):
+        population = self.population
+        num_parents = self.num_parents
+        num_children = self.num_children
+        parent_indices = self.parent_indices
+        children_indices = self.children_indices
+        gen = self.generation
+        generation_start_time = time.perf_counter()
+        if self.instrumented:
+            self.phase_start = time.perf_counter_ns()
+
+        # the modification procedure
+        # inheritance
+        # the parents already occupy the first num_parents rows of the population (no copy needed)
+        if self.instrumented:
+            self._phase("inheritance")
+
+        # for children generation tracking
+        indiv_count = num_parents
+
+        # number of children we need to generate is \lambda (+ \mu)
+        # mutation size change
+        mutation_size = self.mutation_size_start + (self.mutation_size_end - self.mutation_size_start) * gen / (self.total_generations - 1)
+
+        crossover_count, indiv_count = crossover_module(population,
+                                                        self.crossover_ratio,
+                                                        num_parents, num_children,
+                                                        gen, indiv_count,
+                                                        self.crossover_method, self.crossover_points)
+
+        assert indiv_count == num_parents + crossover_count * 2
+        if self.instrumented:
+            self._phase("crossover")
+
+        # mutation
+        _, indiv_count, mutant_rows, mutant_loci = mutation_module(population,
+                                                                   crossover_count, self.crossover_mutation_ratio,
+                                                                   num_parents, num_children,
+                                                                   gen, indiv_count,
+                                                                   self.num_elements_to_mutate,
+                                                                   continuous = self.continuous,
+                                                                   mutation_size = mutation_size,
+                                                                   mutation_mode = self.mutation_mode,
+                                                                   mutation_rate = self.mutation_rate,
+                                                                   continuous_mutation = self.continuous_mutation,
+                                                                   return_mutations = True)
+
+        assert indiv_count == num_parents + num_children
+        if self.instrumented:
+            self._phase("mutation")
+
+        # the assessement procedure
+        # the children gene pool consists of \mu + \lambda
+        # evaluate all of the new children with a single batch call
+        if self.delta_landscape is None or mutant_loci is None:
+            self._evaluate(children_indices)
+        else:
+            # crossover children are evaluated in full, mutated parents only where their flips reach
+            crossover_indices = np.arange(num_parents, mutant_rows[0] if mutant_rows.size != 0 else indiv_count)
+            self._evaluate(crossover_indices)
+            # with crossover_ratio = 1 every child comes from crossover and no parent is mutated
+            if mutant_rows.size != 0:
+                population.fitness[mutant_rows] = delta_evaluate_contributions(population, mutant_rows, mutant_loci,
+                                                                               self.delta_landscape)
+                if self.profile:
+                    self.counters["delta_evaluations"] += len(mutant_rows)
+        if self.instrumented:
+            self._phase("assessment")
+
+        # set novelty (the whole generation is measured against the archive in one batch query)
+        self._assess_novelty(children_indices)
+        # children rows should be filled at this point
+        if self.instrumented:
+            self._phase("novelty")
+
+        # diversity measurement (sampled every diversity_every generations, carried forward in between)
+        if gen % self.diversity_every == 0 or self.diversity is None:
+            self.diversity = get_diversity(population.genomes, self.diversity_metric,
+                                           self.genome_length if population.packed else None)
+        diversity = self.diversity
+        if self.instrumented:
+            self._phase("diversity")
+
+        # tournament selection
+        if self.tournament_selection == False:
+            selected_indices = truncation_selection_module(population,
+                                                           self.downhill_prob,
+                                                           num_parents, num_children,
+                                                           self.novelty_selection,
+                                                           self.novelty_selection_prop)
+
+
+        else:
+            # tournament selection with replacement
+            # fitness + novelty goes through tournament_key ("weighted" or "lexicographic")
+            # otherwise, if novelty_selection, novelty proportion is assumed to be 1.0
+
+            selected_indices = tournament_selection_module(population,
+                                                           self.tournament_size, self.num_tournament_winners,
+                                                           num_parents, num_children,
+                                                           self.novelty_selection,
+                                                           self.tournament_key, self.novelty_weight)
+
+        assert len(selected_indices) == num_parents
+
+        # the survivors become the parents in the first num_parents rows
+        population.select(selected_indices)
+
+        # Track generation progress
+        best_index = np.argmax(population.fitness[parent_indices])
+        parent_best_score = population.fitness[best_index]
+        parent_best_solution = population[best_index].genome
+        parent_best_generation = population.generation[best_index]
+        if self.instrumented:
+            self._phase("selection")
+
+        # random restart
+        if self.restart_every != 0:
+            if (gen + 1) % self.restart_every == 0 or gen + 1 == self.total_generations: # random restart wins
+                # save current parent if it's the best score (copy of procedure with no random restart
+                if parent_best_score > self.best_score:
+                    self.best_solution = np.copy(parent_best_solution)
+                    self.best_score = parent_best_score
+                    self.best_generation = parent_best_generation
+                # initialize population
+                self._initialize_parents()
+
+        else:
+            self.best_solution = np.copy(parent_best_solution)
+            self.best_score = parent_best_score
+            self.best_generation = parent_best_generation
+
+        # record keeping
+        generation_time = time.perf_counter() - generation_start_time
+        self.fitness_over_time[gen] = self.best_score # becomes novelty over time if novelty_selection
+        self.diversity_over_time[gen] = diversity
+        if self.recorder is None:
+            self.solutions_over_time.append(np.copy(self.best_solution))
+        else:
+            self.recorder.record(gen, self.best_score, self.best_solution, diversity,
+                                 archive_size = len(self.solution_archive),
+                                 generation_time = generation_time)
+
+        if self.best_score > self.stagnation_score:
+            self.stagnation_score = self.best_score
+            self.last_improvement = gen + 1
+        self.generation = gen + 1
+
+        if self.profile:
+            # Individual objects used to be deep-copied into the children (mu), by crossover and
+            # mutation (lambda) and by selection (mu); rows are now moved by index instead
+            self.counters["generations"] += 1
+            self.counters["deepcopies_avoided"] += 2 * num_parents + num_children
+        if self.instrumented:
+            self._phase("record_keeping")
+
+        return {"generation": gen,
+                "best_score": self.best_score,
+                "best_solution": self.best_solution,
+                "best_generation": self.best_generation,
+                "diversity": diversity,
+                "archive_size": len(self.solution_archive),
+                "generation_time": generation_time}
+
+    def _check_stop(self):
+        if self.target_fitness is not None and self.best_score >= self.target_fitness:
+            return "target_fitness"
+        if self.stagnation_window != 0 and self.generation - self.last_improvement >= self.stagnation_window:
+            return "stagnation"
+        if self.time_budget is not None and time.perf_counter() - self.start_time >= self.time_budget:
+            return "time_budget"
+        if self.generation >= self.total_generations:
+            return "total_generations"
+        return None
+
+    def save_checkpoint(self, path):
+        """
+        Atomically write the full search state (population, novelty archive, random state,
+        best-so-far, generation counter) to path; resume from it with resume_from = path
+        """
+        if self.recorder is not None:
+            self.recorder.flush()
+        random_state = np.random.get_state() if self.random_state is None else self.random_state
+        save_checkpoint(path, {"generation": self.generation,
+                               "population": self.population,
+                               "solution_archive": self.solution_archive,
+                               "best_solution": self.best_solution,
+                               "best_score": self.best_score,
+                               "best_generation": self.best_generation,
+                               "fitness_over_time": self.fitness_over_time[:self.generation],
+                               "diversity_over_time": self.diversity_over_time[:self.generation],
+                               "solutions_over_time": self.solutions_over_time,
+                               "stagnation_score": self.stagnation_score,
+                               "last_improvement": self.last_improvement,
+                               "num_recorded": self.recorder.num_records() if self.recorder is not None else None,
+                               "random_state": random_state})
+        self.last_checkpoint_time = time.perf_counter()
+
+    def best_parents(self, num_individuals):
+        """
+        returns:
+        rows: (numpy array of int) rows of the num_individuals fittest parents (e.g. emigrants of an island)
+        """
+        fitness = self.population.fitness[:self.num_parents]
+        num_individuals = min(num_individuals, self.num_parents)
+        return np.argpartition(-fitness, num_individuals - 1)[:num_individuals]
+
+    def immigrate(self, genomes):
+        """
+        Replace the least fit parents with genomes (rows in the storage format of the population, e.g. bit-packed),
+        which are evaluated, measured against the archive and offered to it like newly created children
+
+        parameters:
+        genomes: (numpy array of shape (num_immigrants, ...)) immigrating genomes
+        """
+        num_immigrants = min(len(genomes), self.num_parents)
+        if num_immigrants == 0:
+            return
+        fitness = self.population.fitness[:self.num_parents]
+        rows = np.argpartition(fitness, num_immigrants - 1)[:num_immigrants]
+        self.population.genomes[rows] = genomes[:num_immigrants]
+        self.population.generation[rows] = self.generation
+        # archive eviction may draw from the random stream of the run
+        outer_state = self._enter_random_state()
+        try:
+            self._evaluate(rows)
+            self._assess_novelty(rows)
+        finally:
+            self._exit_random_state(outer_state)
+
+    def profile_summary(self):
+        """
+        returns:
+        summary: (dict) "phase_seconds": total time spent in each phase (profile or hooks only),
+                 "phase_fractions": share of each phase in the instrumented time,
+                 "counters": generations, fitness evaluations (full and delta), copies of individuals avoided,
+                 current archive size and, if fitness goes through a FitnessCache, the cache hits and misses
+                 of this run (profile only)
+        """
+        total_time = sum(self.phase_times.values())
+        counters = dict(self.counters)
+        counters["archive_size"] = len(self.solution_archive)
+        if self.fitness_cache is not None:
+            cache_stats = self.fitness_cache.stats()
+            counters["cache_hits"] = cache_stats["hits"] - self.initial_cache_stats["hits"]
+            counters["cache_misses"] = cache_stats["misses"] - self.initial_cache_stats["misses"]
+        return {"phase_seconds": {phase: nanoseconds * 1e-9 for phase, nanoseconds in self.phase_times.items()},
+                "phase_fractions": {phase: nanoseconds / total_time if total_time != 0 else 0.0
+                                    for phase, nanoseconds in self.phase_times.items()},
+                "counters": counters}
+
+    def __iter__(self):
+        """
+        Lazily run the remaining generations, yielding the state of each (see step)
+        """
+        while not self.done:
+            yield self.step()
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def run_until(self, generation = None):
+        """
+        Run until generation generations have been run (default: total_generations)
+        or an early-stopping criterion is met
+
+        returns:
+        stop_reason: (string) why the run stopped ("target_fitness", "stagnation", "time_budget",
+                     "total_generations"), None if it merely reached generation
+        """
+        if generation is None:
+            generation = self.total_generations
+        while not self.done and self.generation < generation:
+            self.step()
+        if self.recorder is not None:
+            self.recorder.flush()
+        return self.stop_reason
+
+    def results(self, return_details = False):
+        """
+        Records of the generations run so far (see evolutionary_algorithm for the returns)
+        """
+        fitness_over_time = self.fitness_over_time[:self.generation]
+        diversity_over_time = self.diversity_over_time[:self.generation]
+        if return_details:
+            return (self.best_solution, self.best_score, self.best_generation,
+                    fitness_over_time, self.solutions_over_time, diversity_over_time)
+        else:
+            return fitness_over_time, self.solutions_over_time, diversity_over_time
 
 
 def evolutionary_algorithm(fitness_function = None,
@@ -9,21 +578,48 @@ def evolutionary_algorithm(fitness_function = None,
                            num_children = 10,
                            continuous = False,
                            genome_length = 10,
+                           packed_genomes = False,
                            num_elements_to_mutate = 1,
+                           mutation_mode = "exact",
+                           mutation_rate = None,
+                           continuous_mutation = "uniform",
                            mutation_size_start = 1.0,
                            mutation_size_end = 0.1,
                            crossover = False,
                            crossover_ratio = 0.6,
                            crossover_mutation_ratio = 0.25,
+                           crossover_method = "k_point",
+                           crossover_points = 2,
                            restart_every = 0,
                            downhill_prob = 0.2,
                            tournament_selection = False,
                            tournament_size = 4,
                            num_tournament_winners = 2,
+                           tournament_key = None,
+                           novelty_weight = 0.5,
                            novelty_selection = True,
                            novelty_k = 5,
                            novelty_selection_prop = 0,
                            max_archive_length = 100,
+                           archive_eviction_policy = "novelty",
+                           diversity_metric = "std",
+                           diversity_every = 1,
+                           batch_fitness_function = None,
+                           packed_fitness_function = None,
+                           evaluator = None,
+                           evaluation_chunk_size = None,
+                           delta_landscape = None,
+                           recorder = None,
+                           checkpoint_path = None,
+                           checkpoint_every = 0,
+                           checkpoint_seconds = 0,
+                           resume_from = None,
+                           target_fitness = None,
+                           stagnation_window = 0,
+                           time_budget = None,
+                           seed = None,
+                           hooks = None,
+                           profile = False,
                            return_details = False):
     """
     Evolutinary Algorithm (copied from the basic hillclimber in our last assignment)
@@ -35,174 +631,124 @@ def evolutionary_algorithm(fitness_function = None,
     num_parents: (int) the number of parents we downselect to at each generation (mu)
     num_children: (int) the number of children (note: parents not included in this count) that we baloon to each generation (lambda)
     genome_length: (int) length of the genome to be evoloved
+    packed_genomes: (bool) store binary genomes bit-packed in uint64 words; crossover, mutation, novelty, diversity
+                    and N-K delta evaluation then work on the words directly (same search as unpacked genomes)
     num_elements_to_mutate: (int) number of alleles to modify during mutation (0 = no mutation)
+    mutation_mode: (string) "exact" (exactly num_elements_to_mutate distinct loci) or "per_bit" (each locus flips with mutation_rate)
+    mutation_rate: (float) per-locus mutation probability of "per_bit" mode (default 1 / genome_length)
+    continuous_mutation: (string) "uniform" or "gaussian" perturbation of floating point vectors
     mutation_size_start: (float) scaling parameter of the magnitidue of mutations for floating point vectors at the beginning of search
     mutation_size_end: (float) scaling parameter of the magnitidue of mutations for floating point vectors at the end of search (note: if same as mutation_size_start, mutation rate is static, otherwise mutation rate is linearly interpolated between the two)
     crossover: (bool) whether to perform crossover when generating children
+    crossover_method: (string) "k_point" or "uniform" crossover
+    crossover_points: (int) number of cut points of k-point crossover (2 = two-point crossover)
     tournament_size: (int) number of individuals competing in each tournament
     num_tournament_winners: (int) number of individuals selected as future parents from each tournament (must be less than tournament_size)
+    tournament_key: (string) what tournaments are won on: "fitness", "novelty", "weighted" or "lexicographic" (fitness, then novelty)
+                    (default: "novelty" if novelty_selection else "fitness")
+    novelty_weight: (float) weight of novelty against fitness for the "weighted" tournament key
+    novelty_selection: (bool) whether novelty takes part in selection (the novelty archive is disabled otherwise)
+    novelty_k: (int) number of nearest archived neighbours used to measure novelty
+    novelty_selection_prop: (float) proportion of parents selected by novelty rather than fitness (truncation selection)
+    max_archive_length: (int) capacity of the novelty archive
+    archive_eviction_policy: (string) which archived genome makes room for a new one once the archive is full
+                             ("novelty": least novel, "fifo": oldest, "random": reservoir sampling)
+    diversity_metric: (string) how diversity_over_time is measured: "std" (per-locus standard deviation), "entropy"
+                      (per-locus allele entropy), "hamming" (mean pairwise Hamming distance) or "unique" (distinct genotypes)
+    diversity_every: (int) measure diversity every diversity_every generations, carrying the last value forward in between
+    batch_fitness_function: (callable function) that returns the fitness of every row of a genome matrix in one call
+                            (e.g. as defined in Landscape.get_fitness_batch); if None, fitness_function is called per genome
+    packed_fitness_function: (callable function) that returns the fitness of every row of a bit-packed genome matrix
+                             (e.g. as defined in Landscape.get_fitness_packed); with packed_genomes, genomes are
+                             unpacked for fitness_function / batch_fitness_function if None
+    evaluator: (executor) concurrent.futures-style executor (e.g. FitnessProcessPool) that evaluates chunks of
+               genomes in parallel; evaluation happens in this process if None
+    evaluation_chunk_size: (int) number of genomes sent to a worker per task (default: spread evenly over the workers)
+    delta_landscape: (Landscape) if given, fitness is evaluated on this N-K landscape instead of fitness_function,
+                     caching per-gene contributions so that mutated copies of parents only re-evaluate the genes
+                     affected by their flipped loci (binary genomes with "exact" mutation)
+    recorder: (RunRecorder) if given, per-generation records (best fitness and genome, diversity, archive size,
+              timing) are streamed to it instead of keeping every best genome in solutions_over_time
+    checkpoint_path: (string) file the full search state (population, novelty archive, np.random state,
+                     best-so-far, generation counter) is atomically written to
+    checkpoint_every: (int) write a checkpoint every checkpoint_every generations (0 = never)
+    checkpoint_seconds: (float) write a checkpoint once checkpoint_seconds have passed since the last one (0 = never)
+    resume_from: (string) checkpoint to continue from; with the same parameters the run continues bit-for-bit
+                 as if it had never been interrupted (the log of a recorder is rolled back to that checkpoint first)
+    target_fitness: (float) stop early once the best score reaches target_fitness (None = never)
+    stagnation_window: (int) stop early once the best score has not improved for stagnation_window generations (0 = never)
+    time_budget: (float) stop early once time_budget seconds of wall-clock time have been spent (None = never)
+    seed: (int or array of int) seed of a random stream owned by the run (the global np.random stream is used if None),
+          so that runs interleaved in one process do not affect each other's results
+    hooks: (dict) callables (or lists of them) called as hook(engine, phase) at the end of a phase of every generation;
+           phases: "inheritance", "crossover", "mutation", "assessment", "novelty", "diversity", "selection", "record_keeping"
+    profile: (bool) time every phase and count fitness evaluations, fitness cache hits and the copies of individuals
+             avoided; the summary (see EvolutionaryAlgorithm.profile_summary) is returned last if return_details
 
     returns:
+    (the records end at the last generation run if an early-stopping criterion is met)
     fitness_over_time: (numpy array) track record of the top fitness value at each generation
-    solutions_over_time: (numpy array) track record of the top genome value at each generation
+    solutions_over_time: (numpy array) track record of the top genome value at each generation (empty when a recorder is given)
     diversity_over_time: (numpy array) track record of the population genetic diversity at each generation
     """
-    # initialize record keeping
-    fitness_over_time = np.empty(total_generations)
-    diversity_over_time = np.empty(total_generations)
-    solutions_over_time = []
-
-    # novelty distance archive
-    solution_archive = []
-    if not novelty_selection:
-        max_archive_length = 0
-
-    # the initialization proceedure
-    parents = [] # num_parents
-    for i in range(num_parents):
-        parents.append(Individual(fitness_function, genome_length))
-
-
-    children = [] # num_parents + num_children
-
-    # only one best solution and score
-    parent_best_solution = None
-    parent_best_score = 0 # per generation
-    parent_best_generation = 0 # per generation
-    best_solution = None
-    best_score = 0
-    best_generation = 0
-
-    for i in range(num_parents):
-        # get population fitness
-        parents[i].eval_fitness()
-
-        # get population novelty
-        novelty = get_novelty(solution_archive, parents[i], novelty_k)
-        parents[i].assign_novelty(novelty)
-        update_archive(solution_archive, parents[i], max_archive_length)
-
-    for gen in range(total_generations): # repeat
-        # the modification procedure
-        # inheritance
-        children = copy.deepcopy(parents) # "children" has num_parents for now
-
-        # for children generation tracking
-        indiv_count = copy.copy(num_parents)
-        assert (len(children) == num_parents) and (len(parents) == num_parents)
-
-        # number of children we need to generate is \lambda (+ \mu)
-        # crossover
-        if crossover != True:
-            crossover_ratio = 0
-            crossover_mutation_ratio = 0
-
-        # mutation size change
-        mutation_size = mutation_size_start + (mutation_size_end - mutation_size_start) * gen / (total_generations - 1)
-
-        crossover_count, indiv_count = crossover_module(children, parents,
-                                                        crossover_ratio,
-                                                        num_parents, num_children,
-                                                        gen, indiv_count)
-
-        assert len(children) == num_parents + crossover_count * 2
-        assert indiv_count == len(children)
-
-        # mutation
-        _, indiv_count = mutation_module(children, parents,
-                                         crossover_count, crossover_mutation_ratio,
-                                         num_parents, num_children,
-                                         gen, indiv_count,
-                                         num_elements_to_mutate,
-                                         continuous = continuous)
-
-        assert len(children) == num_parents + num_children
-        assert indiv_count == len(children)
-
-        # clear out parents before assessment and replacement
-        parents = []
-
-        # the assessement procedure
-        # the children gene pool consists of \mu + \lambda
-        for i in range(num_children):
-            children[num_parents + i].eval_fitness()
-
-            # set novelty
-            novelty = get_novelty(solution_archive, children[num_parents + i], novelty_k)
-            children[num_parents + i].assign_novelty(novelty)
-            update_archive(solution_archive, children[num_parents + i], max_archive_length)
-        # children_generation array should be filled at this point
-
-        # diversity measurement
-        diversity = get_diversity(children,
-                                  num_parents + num_children,
-                                  genome_length)
-
-        # tournament selection
-        if tournament_selection == False:
-            truncation_selection_module(parents, children,
-                                        downhill_prob,
-                                        num_parents, num_children,
-                                        novelty_selection,
-                                        novelty_selection_prop)
-
-
-        else:
-            # tournament selection with replacement
-            # fitness + novelty is NOT implemented here
-            # if novelty_selection, novelty proportion is assumed to be 1.0
-
-            tournament_selection_module(parents, children,
-                                        tournament_size, num_tournament_winners,
-                                        num_parents, num_children,
-                                        novelty_selection)
-
-        assert len(parents) == num_parents
-
-        # Clear out children, because we're not using it anymore
-        children = []
-
-        # Track generation progress
-        parents_score = np.zeros(num_parents)
-        for i in range(num_parents):
-            parents_score = parents[i].fitness
-        best_index = np.flip(np.argsort(parents_score))[0]
-        parent_best_score = parents[best_index].fitness
-        parent_best_solution = parents[best_index].genome
-        parent_best_generation = parents[best_index].generation
-
-        # random restart
-        if restart_every != 0:
-            if (gen + 1) % restart_every == 0 or gen + 1 == total_generations: # random restart wins
-                # save current parent if it's the best score (copy of procedure with no random restart
-                if parent_best_score > best_score:
-                    best_solution = copy.deepcopy(parent_best_solution)
-                    best_score = copy.copy(parent_best_score)
-                    best_generation = copy.copy(parent_best_generation)
-                # initialize population
-                parents = []
-                for i in range(num_parents):
-                    parents.append(Individual(fitness_function,
-                                              genome_length))
-                    # fitness only
-                    parents[i].eval_fitness()
-
-                    # novelty only
-                    novelty = get_novelty(solution_archive, individual, novelty_k)
-                    parents[i].assign_novelty(novelty)
-                    update_archive(solution_archive, parents[i], max_archive_length)
-
-        else:
-            best_solution = copy.deepcopy(parent_best_solution)
-            best_score = copy.copy(parent_best_score)
-            best_generation = copy.copy(parent_best_generation)
-
-        # record keeping
-        fitness_over_time[gen] = copy.copy(best_score) # becomes novelty over time if novelty_selection
-        solutions_over_time.append(copy.deepcopy(best_solution))
-        diversity_over_time[gen] = copy.copy(diversity)
-
-    if return_details:
-        return best_solution, best_score, best_generation, fitness_over_time, solutions_over_time, diversity_over_time
-    else:
-        return fitness_over_time, solutions_over_time, diversity_over_time
+    engine = EvolutionaryAlgorithm(fitness_function = fitness_function,
+                                   total_generations = total_generations,
+                                   num_parents = num_parents,
+                                   num_children = num_children,
+                                   continuous = continuous,
+                                   genome_length = genome_length,
+                                   packed_genomes = packed_genomes,
+                                   num_elements_to_mutate = num_elements_to_mutate,
+                                   mutation_mode = mutation_mode,
+                                   mutation_rate = mutation_rate,
+                                   continuous_mutation = continuous_mutation,
+                                   mutation_size_start = mutation_size_start,
+                                   mutation_size_end = mutation_size_end,
+                                   crossover = crossover,
+                                   crossover_ratio = crossover_ratio,
+                                   crossover_mutation_ratio = crossover_mutation_ratio,
+                                   crossover_method = crossover_method,
+                                   crossover_points = crossover_points,
+                                   restart_every = restart_every,
+                                   downhill_prob = downhill_prob,
+                                   tournament_selection = tournament_selection,
+                                   tournament_size = tournament_size,
+                                   num_tournament_winners = num_tournament_winners,
+                                   tournament_key = tournament_key,
+                                   novelty_weight = novelty_weight,
+                                   novelty_selection = novelty_selection,
+                                   novelty_k = novelty_k,
+                                   novelty_selection_prop = novelty_selection_prop,
+                                   max_archive_length = max_archive_length,
+                                   archive_eviction_policy = archive_eviction_policy,
+                                   diversity_metric = diversity_metric,
+                                   diversity_every = diversity_every,
+                                   batch_fitness_function = batch_fitness_function,
+                                   packed_fitness_function = packed_fitness_function,
+                                   evaluator = evaluator,
+                                   evaluation_chunk_size = evaluation_chunk_size,
+                                   delta_landscape = delta_landscape,
+                                   recorder = recorder,
+                                   checkpoint_path = checkpoint_path,
+                                   checkpoint_every = checkpoint_every,
+                                   checkpoint_seconds = checkpoint_seconds,
+                                   resume_from = resume_from,
+                                   target_fitness = target_fitness,
+                                   stagnation_window = stagnation_window,
+                                   time_budget = time_budget,
+                                   seed = seed,
+                                   hooks = hooks,
+                                   profile = profile)
+    engine.run_until()
+    if return_details and profile:
+        return engine.results(return_details) + (engine.profile_summary(),)
+    return engine.results(return_details)
+
+
+def _find_fitness_cache(fitness_function, batch_fitness_function):
+    # the FitnessCache behind the fitness functions, if any (e.g. fitness_cache and fitness_cache.evaluate_batch)
+    for function in (fitness_function, batch_fitness_function):
+        owner = getattr(function, "__self__", function)
+        if isinstance(owner, FitnessCache):
+            return owner
+    return None
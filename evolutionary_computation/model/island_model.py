@@ -0,0 +1,206 @@
+import numpy as np
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+from .evolutionary_algorithm import EvolutionaryAlgorithm
+from .modules.bit_packing import packed_length
+
+"""
+Island Model
+
+Every island is an EvolutionaryAlgorithm engine (with its own parameters, archive and random stream)
+in its own worker process. Every migration_every generations, each island writes the genomes of its
+num_migrants fittest parents into its slot of a multiprocessing.shared_memory buffer, waits for every
+other island, and replaces its least fit parents with the migrants of the islands it receives from
+(which also enter its novelty archive, so that their lineage is not scored as novel again and again):
+
+ring: island i receives from island i - 1
+random: the islands form a new random ring at every migration
+full: every island receives the fittest migrants of all other islands
+
+Genomes cross process boundaries through the shared buffers only, they are never pickled.
+"""
+
+topologies = ("ring", "random", "full")
+
+
+def migration_sources(topology, num_islands, migration, seed = 0):
+    """
+    returns:
+    sources: (list of list of int) islands every island receives migrants from at this migration
+    """
+    if topology == "ring":
+        return [[(island - 1) % num_islands] for island in range(num_islands)]
+    elif topology == "random":
+        # the same ring on every island: drawn from the seed and the migration, not from the island streams
+        order = np.random.default_rng([seed, migration]).permutation(num_islands)
+        sources = [None] * num_islands
+        for position, island in enumerate(order):
+            sources[island] = [int(order[position - 1])]
+        return sources
+    elif topology == "full":
+        return [[source for source in range(num_islands) if source != island] for island in range(num_islands)]
+    raise ValueError("unknown topology " + repr(topology) + ", expected one of " + str(topologies))
+
+
+def _genome_storage(genome_length, continuous = False, packed_genomes = False):
+    """
+    returns:
+    row_shape: (tuple) shape of one stored genome
+    dtype: (numpy dtype) dtype of the stored genomes (as in Population)
+    """
+    if packed_genomes and not continuous:
+        return (packed_length(genome_length),), np.uint64
+    elif not continuous:
+        return (genome_length,), np.uint8
+    return (genome_length,), np.float64
+
+
+def _island_worker(island, params, seed, root_seed, num_islands, migration_generations, num_migrants, topology,
+                   genome_buffer_name, fitness_buffer_name, barrier, results_queue):
+    engine = EvolutionaryAlgorithm(**params, seed = seed)
+    row_shape, dtype = _genome_storage(engine.genome_length, engine.continuous, engine.packed_genomes)
+    genome_buffer = shared_memory.SharedMemory(name = genome_buffer_name)
+    fitness_buffer = shared_memory.SharedMemory(name = fitness_buffer_name)
+    try:
+        emigrants = np.ndarray((num_islands, num_migrants) + row_shape, dtype = dtype, buffer = genome_buffer.buf)
+        emigrant_fitness = np.ndarray((num_islands, num_migrants), dtype = np.float64, buffer = fitness_buffer.buf)
+
+        # every island takes part in every migration of the shared schedule (even after stopping early
+        # or running fewer generations), so that no barrier waits forever
+        for migration, generation in enumerate(migration_generations):
+            engine.run_until(generation)
+            rows = engine.best_parents(num_migrants)
+            emigrants[island, :len(rows)] = engine.population.genomes[rows]
+            emigrant_fitness[island, :len(rows)] = engine.population.fitness[rows]
+            emigrant_fitness[island, len(rows):] = -np.inf
+            barrier.wait()
+
+            sources = migration_sources(topology, num_islands, migration, root_seed)[island]
+            candidates = emigrants[sources].reshape((-1,) + row_shape)
+            candidate_fitness = emigrant_fitness[sources].ravel()
+            chosen = np.argsort(-candidate_fitness, kind = "stable")[:num_migrants]
+            chosen = chosen[np.isfinite(candidate_fitness[chosen])]
+            immigrants = candidates[chosen].copy()
+            # nobody overwrites its slot before every island has read its immigrants
+            barrier.wait()
+            if not engine.done:
+                engine.immigrate(immigrants)
+
+        engine.run_until()
+        best_solution, best_score, best_generation, fitness_over_time, _, diversity_over_time = engine.results(True)
+        results_queue.put((island, best_solution, best_score, best_generation, fitness_over_time, diversity_over_time))
+    finally:
+        genome_buffer.close()
+        fitness_buffer.close()
+
+
+def island_evolutionary_algorithm(num_islands = 4,
+                                  migration_every = 10,
+                                  num_migrants = 2,
+                                  topology = "ring",
+                                  island_params = None,
+                                  seed = 0,
+                                  mp_context = None,
+                                  return_details = False,
+                                  **params):
+    """
+    Island model of evolutionary_algorithm: every island evolves in its own process and the fittest
+    parents migrate between islands every migration_every generations
+
+    parameters:
+    num_islands: (int) number of islands (and worker processes)
+    migration_every: (int) number of generations between migrations
+    num_migrants: (int) number of parents every island sends (and receives) at each migration
+    topology: (string) "ring", "random" or "full" (see the module docstring)
+    island_params: (list of dict) parameters of each island overriding params (e.g. its own selection scheme,
+                   {"tournament_selection": True}), None to run the same parameters on every island;
+                   migrations follow the longest total_generations, islands that finished only send migrants
+    seed: (int) root seed; island i draws from SeedSequence(seed, spawn_key = (i,)) (island_params cannot set a seed)
+    mp_context: (string) start method of the worker processes (default: the platform's)
+    return_details: (bool) also return the best solution of every island
+    params: parameters of evolutionary_algorithm shared by every island (fitness_function, total_generations, ...);
+            every island must store its genomes the same way (genome_length, continuous, packed_genomes)
+
+    returns:
+    best_solutions: (numpy array of shape (num_islands, genome_length)) best solution of every island (return_details)
+    best_scores: (numpy array of shape (num_islands,)) best score of every island (return_details)
+    best_generations: (numpy array of shape (num_islands,)) generation of the best score of every island (return_details)
+    fitness_over_time: (numpy array of shape (num_islands, total_generations)) best fitness of every island
+                       (islands stopped early or running fewer generations carry their last record forward)
+    diversity_over_time: (numpy array of shape (num_islands, total_generations)) diversity of every island
+    """
+    if topology not in topologies:
+        raise ValueError("unknown topology " + repr(topology) + ", expected one of " + str(topologies))
+    if migration_every < 1:
+        raise ValueError("migration_every must be at least 1, got " + str(migration_every))
+    if island_params is None:
+        island_params = [{}] * num_islands
+    if len(island_params) != num_islands:
+        raise ValueError("island_params holds " + str(len(island_params)) + " islands, expected " + str(num_islands))
+    if any("seed" in overrides for overrides in island_params):
+        raise ValueError("islands cannot be given their own seed: island i always draws from "
+                         "SeedSequence(seed, spawn_key = (i,)) of the root seed")
+    island_params = [dict(params, **overrides) for overrides in island_params]
+    storage = set((island.get("genome_length", 10), island.get("continuous", False), island.get("packed_genomes", False))
+                  for island in island_params)
+    if len(storage) != 1:
+        raise ValueError("every island must share genome_length, continuous and packed_genomes to exchange genomes")
+    row_shape, dtype = _genome_storage(*storage.pop())
+    # one migration schedule for every island, whatever its own total_generations
+    total_generations = max(island.get("total_generations", 100) for island in island_params)
+    migration_generations = list(range(migration_every, total_generations, migration_every))
+
+    context = multiprocessing.get_context(mp_context)
+    genome_buffer = shared_memory.SharedMemory(
+        create = True, size = max(1, num_islands * num_migrants * int(np.prod(row_shape)) * np.dtype(dtype).itemsize))
+    fitness_buffer = shared_memory.SharedMemory(create = True, size = max(1, num_islands * num_migrants * 8))
+    barrier = context.Barrier(num_islands)
+    results_queue = context.Queue()
+    workers = [context.Process(target = _island_worker,
+                               args = (island, island_params[island],
+                                       np.random.SeedSequence(seed, spawn_key = (island,)).generate_state(4), seed,
+                                       num_islands, migration_generations, num_migrants, topology,
+                                       genome_buffer.name, fitness_buffer.name, barrier, results_queue))
+               for island in range(num_islands)]
+    try:
+        for worker in workers:
+            worker.start()
+        results = [None] * num_islands
+        for _ in range(num_islands):
+            while True:
+                try:
+                    island, *island_results = results_queue.get(timeout = 1)
+                    break
+                except queue.Empty:
+                    # a failed island would leave the others waiting at the next migration
+                    if any(worker.exitcode not in (None, 0) for worker in workers):
+                        barrier.abort()
+                        raise RuntimeError("an island worker process failed (exit codes " +
+                                           str([worker.exitcode for worker in workers]) + ")")
+            results[island] = island_results
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        genome_buffer.close()
+        genome_buffer.unlink()
+        fitness_buffer.close()
+        fitness_buffer.unlink()
+
+    best_solutions, best_scores, best_generations, fitness_records, diversity_records = zip(*results)
+    total_generations = max(len(records) for records in fitness_records)
+    fitness_over_time = np.empty((num_islands, total_generations))
+    diversity_over_time = np.empty((num_islands, total_generations))
+    for island in range(num_islands):
+        for over_time, records in ((fitness_over_time, fitness_records[island]),
+                                   (diversity_over_time, diversity_records[island])):
+            over_time[island, :len(records)] = records
+            over_time[island, len(records):] = records[-1] if len(records) != 0 else np.nan
+
+    if return_details:
+        return (np.array(best_solutions), np.array(best_scores), np.array(best_generations),
+                fitness_over_time, diversity_over_time)
+    return fitness_over_time, diversity_over_time
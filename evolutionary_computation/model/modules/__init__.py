@@ -1,3 +1,6 @@
 from .evolutionary_algorithm_modules import *
 from .novelty_diversity_functions import *
 from .individual import *
+from .evaluation import *
+from .population import *
+from .bit_packing import *
@@ -0,0 +1,111 @@
+import numpy as np
+
+"""
+Bit-Packing Utilities for Binary Genomes
+
+Locus i of a genome is stored in word i // 64 at bit i % 64 (least significant bit first),
+so that genomes of any length pack into ceil(L / 64) uint64 words per row.
+"""
+
+# number of set bits of every byte value (fallback when np.bitwise_count is not available)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype = np.uint8)
+
+
+def packed_length(genome_length):
+    return (genome_length + 63) // 64
+
+
+def pack_genomes(genomes):
+    """
+    parameters:
+    genomes: (numpy array of shape (..., genome_length)) binary genomes
+
+    returns:
+    packed: (numpy array of shape (..., ceil(genome_length / 64)) of uint64) bit-packed genomes
+    """
+    genomes = np.asarray(genomes)
+    genome_length = genomes.shape[-1]
+    padded = np.zeros(genomes.shape[:-1] + (packed_length(genome_length) * 64,), dtype = np.uint8)
+    padded[..., :genome_length] = genomes
+    packed = np.packbits(padded, axis = -1, bitorder = "little")
+    return packed.view("<u8").astype(np.uint64)
+
+
+def unpack_genomes(packed, genome_length):
+    """
+    Inverse of pack_genomes; returns uint8 genomes of shape (..., genome_length)
+    """
+    packed_bytes = np.ascontiguousarray(packed, dtype = "<u8").view(np.uint8)
+    return np.unpackbits(packed_bytes, axis = -1, count = genome_length, bitorder = "little")
+
+
+def popcount(words):
+    """
+    Number of set bits of every element of an unsigned integer array (same shape as words)
+    """
+    if hasattr(np, "bitwise_count"): # numpy >= 2.0
+        return np.bitwise_count(words)
+    words = np.ascontiguousarray(words, dtype = np.uint64)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis = -1, dtype = np.uint8)
+
+
+def hamming_distances(packed_a, packed_b):
+    """
+    parameters:
+    packed_a: (numpy array of shape (num_a, num_words)) bit-packed genomes
+    packed_b: (numpy array of shape (num_b, num_words)) bit-packed genomes
+
+    returns:
+    distances: (numpy array of shape (num_a, num_b)) Hamming distance of every pair
+    """
+    return popcount(packed_a[:, None, :] ^ packed_b[None, :, :]).sum(axis = -1, dtype = np.int64)
+
+
+def tail_mask(genome_length):
+    """
+    returns:
+    mask: (numpy array of shape (ceil(genome_length / 64),) of uint64) set bits at the loci of every word
+          (all but the padding bits after the last locus)
+    """
+    mask = np.full(packed_length(genome_length), np.iinfo(np.uint64).max, dtype = np.uint64)
+    if genome_length % 64 != 0:
+        mask[-1] = (np.uint64(1) << np.uint64(genome_length % 64)) - np.uint64(1)
+    return mask
+
+
+def locus_bits(loci):
+    """
+    Word index and single-bit word of every locus (same shape as loci)
+    """
+    loci = np.asarray(loci)
+    return loci // 64, np.uint64(1) << (loci % 64).astype(np.uint64)
+
+
+def get_bits(packed, loci):
+    """
+    parameters:
+    packed: (numpy array of shape (num_genomes, num_words)) bit-packed genomes
+    loci: (numpy array of int of any shape) loci to read
+
+    returns:
+    values: (numpy array of shape (num_genomes,) + loci.shape of uint8) value of each locus of each genome
+    """
+    words, bits = locus_bits(loci)
+    return ((packed[:, words] & bits) != 0).astype(np.uint8)
+
+
+def allele_counts_packed(packed, genome_length):
+    """
+    Number of 1 alleles at each locus of bit-packed gene pool(s)
+
+    parameters:
+    packed: (numpy array of shape (..., num_genes, num_words)) bit-packed genomes
+    genome_length: (int) length of the genomes
+
+    returns:
+    counts: (numpy array of shape (..., genome_length))
+    """
+    counts = np.empty(packed.shape[:-2] + (packed.shape[-1], 64), dtype = np.int64)
+    for bit in range(64): # one pass over the words per bit position, no (num_genes, genome_length) temporary
+        counts[..., bit] = ((packed >> np.uint64(bit)) & np.uint64(1)).sum(axis = -2, dtype = np.int64)
+    return counts.reshape(packed.shape[:-2] + (-1,))[..., :genome_length]
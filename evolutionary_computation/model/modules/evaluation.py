@@ -0,0 +1,280 @@
+import numpy as np
+import functools
+import hashlib
+import os
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Fitness Evaluation Modules
+"""
+
+# fitness functions installed in each worker process by init_fitness_worker
+_worker_fitness_function = None
+_worker_batch_fitness_function = None
+_worker_packed_fitness_function = None
+
+
+def init_fitness_worker(fitness_function, batch_fitness_function = None, packed_fitness_function = None):
+    """
+    Worker initializer: keep the fitness function (e.g. a bound Landscape method, weights included)
+    in the worker process so that tasks only need to carry genomes
+    """
+    global _worker_fitness_function, _worker_batch_fitness_function, _worker_packed_fitness_function
+    _worker_fitness_function = fitness_function
+    _worker_batch_fitness_function = batch_fitness_function
+    _worker_packed_fitness_function = packed_fitness_function
+
+
+def _evaluate_chunk(genomes, fitness_function = None, batch_fitness_function = None, packed = False):
+    # fall back on the functions installed by init_fitness_worker
+    if fitness_function is None and batch_fitness_function is None:
+        if packed:
+            return evaluate_genomes(genomes, None, _worker_packed_fitness_function)
+        fitness_function = _worker_fitness_function
+        batch_fitness_function = _worker_batch_fitness_function
+    return evaluate_genomes(genomes, fitness_function, batch_fitness_function)
+
+
+class FitnessProcessPool(ProcessPoolExecutor):
+    """
+    Process pool whose workers receive the fitness function once at start-up
+
+    Any other executor (thread pool, multiprocessing.Pool, ...) can also be passed as an
+    evaluator, but then the fitness function is shipped along with every chunk.
+    Bit-packed genomes are only evaluated packed by workers given a packed_fitness_function
+    (e.g. Landscape.get_fitness_packed); evolutionary_algorithm unpacks them for the other pools.
+    """
+
+    preloaded_fitness = True
+
+    def __init__(self, fitness_function, batch_fitness_function = None,
+                 max_workers = None, mp_context = None,
+                 packed_fitness_function = None):
+        super().__init__(max_workers = max_workers,
+                         mp_context = mp_context,
+                         initializer = init_fitness_worker,
+                         initargs = (fitness_function, batch_fitness_function, packed_fitness_function))
+        self.preloaded_packed_fitness = packed_fitness_function is not None
+
+
+def function_fingerprint(function):
+    """
+    Identify what a (fitness) function computes, e.g. to check that a resumed sweep evaluates the same landscape
+
+    returns:
+    fingerprint: (string) qualified name of the function, followed by the fingerprint() of the object it is bound to
+                 (or of the callable object itself, e.g. a FitnessCache); None if that object has no fingerprint
+    """
+    owner = getattr(function, "__self__", None)
+    if owner is None and not isinstance(function, (types.FunctionType, types.BuiltinFunctionType, type)):
+        owner = function # callable object
+    named = function if owner is not function else type(function)
+    name = (getattr(named, "__module__", None) or type(owner).__module__) + "." + \
+           getattr(named, "__qualname__", type(named).__qualname__)
+    if owner is None or isinstance(owner, types.ModuleType):
+        return name
+    fingerprint = owner.fingerprint() if hasattr(owner, "fingerprint") else None
+    return name + "@" + fingerprint if fingerprint is not None else None
+
+
+def _num_workers(evaluator):
+    # concurrent.futures executors and multiprocessing pools keep their size in different attributes
+    for attribute in ("_max_workers", "_processes"):
+        num_workers = getattr(evaluator, attribute, None)
+        if num_workers:
+            return num_workers
+    return os.cpu_count() or 1
+
+
+def evaluate_genomes(genomes, fitness_function,
+                     batch_fitness_function = None,
+                     evaluator = None,
+                     chunk_size = None,
+                     packed = False):
+    """
+    Evaluate a whole batch of genomes with a single call when possible
+
+    parameters:
+    genomes: (numpy array of shape (num_genomes, genome_length)) genomes to be evaluated, one per row
+    fitness_function: (callable function) that returns the fitness of a single genome
+    batch_fitness_function: (callable function) that returns the fitness of every row of a genome matrix
+                            (e.g. Landscape.get_fitness_batch); falls back to fitness_function per row if None
+    evaluator: (executor) object with a map(function, iterable) method (concurrent.futures executor,
+               multiprocessing.Pool, FitnessProcessPool) used to evaluate chunks of genomes in parallel;
+               evaluated in the calling process if None
+    chunk_size: (int) number of genomes sent to a worker per task (default: spread evenly over the workers)
+    packed: (bool) genomes are bit-packed uint64 words and batch_fitness_function evaluates them packed
+            (a FitnessProcessPool then evaluates them with its own packed_fitness_function)
+
+    returns:
+    fitness: (numpy array of shape (num_genomes,)) fitness of each genome
+    """
+    if len(genomes) == 0:
+        return np.empty(0)
+
+    if evaluator is not None:
+        if chunk_size is None:
+            chunk_size = int(np.ceil(len(genomes) / _num_workers(evaluator)))
+        chunks = [genomes[i:i + chunk_size] for i in range(0, len(genomes), chunk_size)]
+
+        if getattr(evaluator, "preloaded_fitness", False):
+            if packed and not getattr(evaluator, "preloaded_packed_fitness", False):
+                raise ValueError("the evaluator was preloaded without a packed_fitness_function, "
+                                 "so it cannot evaluate bit-packed genomes (unpack them or preload one)")
+            task = functools.partial(_evaluate_chunk, packed = packed)
+        else:
+            task = functools.partial(_evaluate_chunk,
+                                     fitness_function = fitness_function,
+                                     batch_fitness_function = batch_fitness_function)
+        # map keeps the chunk order, so the results scatter back row by row
+        return np.concatenate(list(evaluator.map(task, chunks)))
+
+    if batch_fitness_function is not None:
+        return np.asarray(batch_fitness_function(genomes), dtype = float)
+
+    fitness = np.empty(len(genomes))
+    for i, genome in enumerate(genomes):
+        fitness[i] = fitness_function(genome)
+    return fitness
+
+
+class FitnessCache:
+    """
+    Memoizing wrapper around a fitness function with bounded LRU eviction
+
+    Genomes are keyed by their bit-packed bytes (integer genomes are assumed to be binary)
+    or by their raw bytes for floating point genomes and genomes already bit-packed in uint64 words. Pass the cache itself as fitness_function
+    and its evaluate_batch as batch_fitness_function; one cache can be shared by many runs
+    on the same landscape.
+    """
+
+    def __init__(self, fitness_function, batch_fitness_function = None,
+                 max_size = 100000,
+                 evaluator = None,
+                 chunk_size = None):
+        """
+        parameters:
+        fitness_function: (callable function) that returns the fitness of a single genome
+        batch_fitness_function: (callable function) that returns the fitness of every row of a genome matrix
+        max_size: (int) maximum number of cached genomes (least recently used evicted first)
+        evaluator: (executor) evaluates the cache misses in parallel (see evaluate_genomes)
+        chunk_size: (int) number of genomes sent to a worker per task
+        """
+        self.fitness_function = fitness_function
+        self.batch_fitness_function = batch_fitness_function
+        self.max_size = max_size
+        self.evaluator = evaluator
+        self.chunk_size = chunk_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _keys(self, genomes):
+        genomes = np.atleast_2d(genomes)
+        # bit-packed rows (uint64 words, see packed_genomes) are keyed as they are
+        if genomes.dtype.kind != "f" and genomes.dtype != np.uint64:
+            genomes = np.packbits(genomes, axis = 1)
+        return [genome.tobytes() for genome in genomes]
+
+    def _insert(self, key, fitness):
+        self.cache[key] = fitness
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last = False)
+            self.evictions += 1
+
+    def __call__(self, genome):
+        key = self._keys(genome)[0]
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        self.misses += 1
+        fitness = self.fitness_function(genome)
+        self._insert(key, fitness)
+        return fitness
+
+    def evaluate_batch(self, genomes):
+        """
+        Fitness of every row of genomes; only the genomes missing from the cache are evaluated, in one batch
+        """
+        keys = self._keys(genomes)
+        fitness = np.empty(len(keys))
+        missing_rows = {} # key -> rows of genomes waiting for that key (duplicates are evaluated once)
+        for i, key in enumerate(keys):
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                fitness[i] = self.cache[key]
+            elif key in missing_rows:
+                self.hits += 1
+                missing_rows[key].append(i)
+            else:
+                self.misses += 1
+                missing_rows[key] = [i]
+
+        if len(missing_rows) != 0:
+            first_rows = [rows[0] for rows in missing_rows.values()]
+            genomes = np.asarray(genomes)
+            missing_fitness = evaluate_genomes(genomes[first_rows],
+                                               self.fitness_function, self.batch_fitness_function,
+                                               self.evaluator, self.chunk_size,
+                                               packed = genomes.dtype == np.uint64)
+            for (key, rows), score in zip(missing_rows.items(), missing_fitness):
+                fitness[rows] = score
+                self._insert(key, score)
+        return fitness
+
+    def clear(self):
+        self.cache.clear()
+
+    def fingerprint(self):
+        """
+        returns:
+        fingerprint: (string) digest of the wrapped functions (see function_fingerprint), None if they have none
+        """
+        fingerprints = [function_fingerprint(function) if function is not None else "None"
+                        for function in (self.fitness_function, self.batch_fitness_function)]
+        if None in fingerprints:
+            return None
+        return hashlib.sha1(" ".join(fingerprints).encode()).hexdigest()
+
+    def stats(self):
+        """
+        returns:
+        stats: (dict) hit, miss and eviction counters, current size and hit rate of the cache
+        """
+        num_lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.cache),
+                "hit_rate": self.hits / num_lookups if num_lookups != 0 else 0.0}
+
+
+def evaluate_contributions(population, rows, landscape):
+    """
+    Full evaluation of population rows on an N-K Landscape, caching their per-gene contributions
+
+    returns:
+    fitness: (numpy array of shape (len(rows),)) fitness of each row
+    """
+    population.contributions[rows] = landscape.get_contributions(population.genomes[rows], population.packed)
+    return np.mean(population.contributions[rows], axis = 1)
+
+
+def delta_evaluate_contributions(population, rows, flipped_loci, landscape):
+    """
+    Delta evaluation of population rows whose cached contributions predate flips at flipped_loci
+    (see Landscape.update_contributions)
+
+    returns:
+    fitness: (numpy array of shape (len(rows),)) fitness of each row
+    """
+    contributions = population.contributions[rows]
+    fitness = landscape.update_contributions(population.genomes[rows], contributions, flipped_loci,
+                                             population.packed)
+    population.contributions[rows] = contributions
+    return fitness
@@ -1,52 +1,132 @@
 import numpy as np
-import copy
+from .bit_packing import packed_length, pack_genomes, tail_mask, locus_bits
 
 """
 Gene Alteration Modules
 """
 
-def crossover_module(children, parents,
+def crossover_mask(num_pairs, genome_length,
+                   crossover_method = "k_point",
+                   crossover_points = 2,
+                   rng = None):
+    """
+    Draw which loci every pair of parents exchanges, all pairs at once
+
+    parameters:
+    num_pairs: (int) number of parent pairs
+    genome_length: (int) length of the genomes
+    crossover_method: (string) "k_point" (segments between crossover_points distinct cut points are swapped)
+                      or "uniform" (every locus is swapped with probability 0.5)
+    crossover_points: (int) number of cut points for "k_point" (2 = two-point crossover)
+    rng: (numpy Generator) random stream to draw from (default: the global np.random state)
+
+    returns:
+    mask: (numpy array of bool of shape (num_pairs, genome_length)) True where the genes are swapped
+    """
+    if rng is None:
+        rng = np.random
+    if crossover_method == "uniform":
+        return rng.random((num_pairs, genome_length)) < 0.5
+
+    cut_points = crossover_cut_points(num_pairs, genome_length, crossover_method, crossover_points, rng)
+
+    # a locus is swapped when an odd number of cut points lie at or before it
+    toggles = np.zeros((num_pairs, genome_length + 1), dtype = np.uint8)
+    toggles[np.arange(num_pairs)[:, None], cut_points] = 1
+    return (np.cumsum(toggles, axis = 1)[:, :genome_length] % 2).astype(bool)
+
+
+def crossover_cut_points(num_pairs, genome_length,
+                         crossover_method = "k_point",
+                         crossover_points = 2,
+                         rng = None):
+    """
+    returns:
+    cut_points: (numpy array of shape (num_pairs, crossover_points)) distinct k-point cut points of every pair
+    """
+    if rng is None:
+        rng = np.random
+    if crossover_method != "k_point":
+        raise ValueError("unknown crossover_method " + repr(crossover_method) +
+                         ", expected \"k_point\" or \"uniform\"")
+
+    # distinct cut points in [1, genome_length] for every pair: the k smallest of random keys
+    crossover_points = min(crossover_points, genome_length)
+    random_keys = rng.random((num_pairs, genome_length))
+    return np.argpartition(random_keys, crossover_points - 1, axis = 1)[:, :crossover_points] + 1
+
+
+def packed_crossover_mask(num_pairs, genome_length,
+                          crossover_method = "k_point",
+                          crossover_points = 2,
+                          rng = None):
+    """
+    crossover_mask in bit-packed form (same draws, so the same loci are swapped)
+
+    returns:
+    mask: (numpy array of shape (num_pairs, ceil(genome_length / 64)) of uint64) set bits where the genes are swapped
+    """
+    if rng is None:
+        rng = np.random
+    if crossover_method == "uniform":
+        return pack_genomes(rng.random((num_pairs, genome_length)) < 0.5)
+
+    cut_points = crossover_cut_points(num_pairs, genome_length, crossover_method, crossover_points, rng)
+
+    # every cut point toggles the loci from it to the end: XOR of one suffix mask per cut point
+    cut_words, cut_bits = locus_bits(cut_points[:, :, None])
+    words = np.arange(packed_length(genome_length))
+    suffixes = np.where(words > cut_words, np.iinfo(np.uint64).max,
+                        np.where(words == cut_words, ~(cut_bits - np.uint64(1)), 0)).astype(np.uint64)
+    return np.bitwise_xor.reduce(suffixes, axis = 1) & tail_mask(genome_length)
+
+
+def crossover_module(population,
                      crossover_ratio,
                      num_parents, num_children,
-                     gen, indiv_count):
+                     gen, indiv_count,
+                     crossover_method = "k_point",
+                     crossover_points = 2):
+    """
+    population = [parents, crossover children (written here), ...]
 
-    crossover_count = int(num_children * crossover_ratio * 0.5)
+    Every pair of parents and their crossover mask are drawn in one shot and the
+    offspring of all pairs are built with a single masked np.where.
+    """
 
-    for i in range(crossover_count):
-        # choose 2 different parent indices
-        a, b = -1, -1
-        while a == b:
-            a, b = np.random.randint(low = 0,
-                                     high = num_parents,
-                                     size = 2)
-
-        # choose 2 different gene indices
-        c, d = -1, -1
-        while c == d:
-            c, d = np.random.randint(low = 1,
-                                     high = parents[0].genome.size + 1,
-                                     size = 2)
-
-        # ensure that c is smaller than d
-        if c > d:
-            tmp = copy.copy(c)
-            c = copy.copy(d)
-            d = tmp # tmp is already a copied version of c
-
-        # crossover process
-        child_a = copy.deepcopy(parents[a])
-        child_b = copy.deepcopy(parents[b])
-        child_a.genome[c:d] = parents[b].genome[c:d]
-        child_b.genome[c:d] = parents[a].genome[c:d]
-        children.append(child_a)
-        children.append(child_b)
-
-        # crossed-over children: record generation that they were created for tracking
-        children[indiv_count].generation = gen
-        children[indiv_count + 1].generation = gen
-        indiv_count += 2
-
-    assert len(children) == num_parents + crossover_count * 2
+    crossover_count = int(num_children * crossover_ratio * 0.5)
+    if crossover_count == 0:
+        return crossover_count, indiv_count
+
+    # choose 2 different parent indices per pair
+    a = np.random.randint(low = 0, high = num_parents, size = crossover_count)
+    if num_parents > 1:
+        b = (a + np.random.randint(low = 1, high = num_parents, size = crossover_count)) % num_parents
+    else:
+        b = a
+
+    # crossover process (children rows are overwritten in place, sibling pairs next to each other)
+    rows_a = indiv_count + 2 * np.arange(crossover_count)
+    rows_b = rows_a + 1
+    parent_a_genomes = population.genomes[a]
+    parent_b_genomes = population.genomes[b]
+    if population.packed:
+        # swap the masked bits of whole words: a ^ ((a ^ b) & mask)
+        mask = packed_crossover_mask(crossover_count, population.genome_length,
+                                     crossover_method, crossover_points)
+        swapped = (parent_a_genomes ^ parent_b_genomes) & mask
+        population.genomes[rows_a] = parent_a_genomes ^ swapped
+        population.genomes[rows_b] = parent_b_genomes ^ swapped
+    else:
+        mask = crossover_mask(crossover_count, population.genome_length,
+                              crossover_method, crossover_points)
+        population.genomes[rows_a] = np.where(mask, parent_b_genomes, parent_a_genomes)
+        population.genomes[rows_b] = np.where(mask, parent_a_genomes, parent_b_genomes)
+
+    # crossed-over children: record generation that they were created for tracking
+    population.generation[rows_a] = gen
+    population.generation[rows_b] = gen
+    indiv_count += 2 * crossover_count
 
     # how unfortunate. indiv_count has become a mutable type at some point
     assert indiv_count == num_parents + crossover_count * 2
@@ -54,77 +134,153 @@ def crossover_module(children, parents,
     return crossover_count, indiv_count
 
 
-def mutation_module(children, parents,
+def mutation_mask(num_genomes, genome_length,
+                  num_elements_to_mutate = 1,
+                  mutation_mode = "exact",
+                  mutation_rate = None,
+                  rng = None):
+    """
+    Draw the loci to be mutated for every genome at once
+
+    parameters:
+    num_genomes: (int) number of genomes to be mutated
+    genome_length: (int) length of the genomes
+    num_elements_to_mutate: (int) number of distinct loci mutated per genome in "exact" mode
+    mutation_mode: (string) "exact" (exactly num_elements_to_mutate distinct loci per genome)
+                   or "per_bit" (every locus mutates independently with probability mutation_rate)
+    mutation_rate: (float) per-locus mutation probability of "per_bit" mode (default 1 / genome_length)
+    rng: (numpy Generator) random stream to draw from (default: the global np.random state)
+
+    returns:
+    mask: (numpy array of bool of shape (num_genomes, genome_length)) True where a locus mutates
+    """
+    if rng is None:
+        rng = np.random
+    if mutation_mode == "per_bit":
+        if mutation_rate is None:
+            mutation_rate = 1 / genome_length
+        return rng.random((num_genomes, genome_length)) < mutation_rate
+
+    if mutation_mode != "exact":
+        raise ValueError("unknown mutation_mode " + repr(mutation_mode) +
+                         ", expected \"exact\" or \"per_bit\"")
+
+    return loci_to_mask(mutation_loci(num_genomes, genome_length, num_elements_to_mutate, rng),
+                        genome_length)
+
+
+def mutation_loci(num_genomes, genome_length,
+                  num_elements_to_mutate = 1,
+                  rng = None):
+    """
+    returns:
+    loci: (numpy array of shape (num_genomes, num_elements_to_mutate)) distinct loci to be mutated in each genome
+    """
+    if rng is None:
+        rng = np.random
+    num_elements_to_mutate = max(min(num_elements_to_mutate, genome_length), 0)
+    if num_elements_to_mutate == 0:
+        return np.zeros((num_genomes, 0), dtype = int)
+    # distinct loci per genome: the num_elements_to_mutate smallest of random keys
+    random_keys = rng.random((num_genomes, genome_length))
+    return np.argpartition(random_keys, num_elements_to_mutate - 1, axis = 1)[:, :num_elements_to_mutate]
+
+
+def loci_to_mask(loci, genome_length):
+    mask = np.zeros((len(loci), genome_length), dtype = bool)
+    mask[np.arange(len(loci))[:, None], loci] = True
+    return mask
+
+
+def mutation_module(population,
                     crossover_count, crossover_mutation_ratio,
                     num_parents, num_children,
                     gen, indiv_count,
                     num_elements_to_mutate = 1,
                     continuous = False,
-                    mutation_size = 1.0):
+                    mutation_size = 1.0,
+                    mutation_mode = "exact",
+                    mutation_rate = None,
+                    continuous_mutation = "uniform",
+                    return_mutations = False):
 
     """
-    children = [parents, crossover(_mutation_parents)]
+    population = [parents, crossover(_mutation_parents), mutation children (written here)]
+
+    Every mutant is drawn at once and the whole batch is mutated in place:
+    XOR flips of binary genomes (see mutation_mask) or, in continuous mode, a
+    "uniform" (+-mutation_size) or "gaussian" (std mutation_size) perturbation of every gene.
+
+    return_mutations: (bool) also return the rows of the mutated copies of parents and the loci flipped
+                      in each of them (None unless binary "exact" mutation), e.g. for delta evaluation
     """
 
     crossover_mutation_count = int(crossover_count * 2 * crossover_mutation_ratio)
-
-    # the parents of crossover x mutation are the crossover genes
-    crossover_mutation_parents = children[num_parents:] # crossover mutation should replace crossover (no deepcopy)
-    assert len(crossover_mutation_parents) == crossover_count * 2
+    num_parent_mutants = num_children - crossover_count * 2
 
     # Since crossover_mutation_ratio is a thiing, assertion of
     # len(crossover_mutation_parents) == crossover_mutation_count doesn't makes sense unless
     # crossover_mutation_ratio = 1.0
     assert indiv_count == num_parents + crossover_count * 2
 
-
-    for i in range(num_children - crossover_count * 2 + crossover_mutation_count): # crossover mutation + mutation only
-        child = None
-
-        # crossover x mutation (up until crossover_mutation_count)
-        if i < crossover_mutation_count:
-            index = np.random.randint(low = 0,
-                                      high = crossover_count * 2,
-                                      size = 1)[0]
-            # crossover mutation should replace crossover (which comes after the parents)
-            child = crossover_mutation_parents[index]
-
-            # are the pointers working?
-            assert children[num_parents + index] == child
-
-        # parents x mutation (child variable is filled here)
-        else: # choose a parent index
-            index = np.random.randint(low = 0,
-                                      high = num_parents,
-                                      size = 1)[0]
-            child = copy.deepcopy(parents[index])
-            children.append(child)
-
-            # mutated children generation tracking
-            assert children[indiv_count] == child # are the pointers working?
-            children[indiv_count].generation = gen
-            indiv_count += 1
-
-        # the actual mutation process per genome
-        if continuous:
-            child.genome = child.genome.astype(float)
-            child.genome += (np.random.rand(child.genome.size) * 2 - 1) * mutation_size
+    # crossover x mutation: crossover children (which come after the parents) are mutated in place,
+    # chosen with replacement
+    crossover_mutation_rows = num_parents + np.random.randint(low = 0,
+                                                              high = max(crossover_count * 2, 1),
+                                                              size = crossover_mutation_count)
+
+    # parents x mutation: copy the chosen parents into the remaining children rows
+    parent_rows = np.random.randint(low = 0, high = num_parents, size = num_parent_mutants)
+    mutant_rows = np.arange(indiv_count, indiv_count + num_parent_mutants)
+    population.copy_rows(mutant_rows, parent_rows)
+
+    # mutated children generation tracking
+    population.generation[mutant_rows] = gen
+    indiv_count += num_parent_mutants
+
+    # the actual mutation process, whole batch at once
+    rows = np.concatenate((crossover_mutation_rows, mutant_rows))
+    # a crossover child drawn twice has to be mutated twice (unbuffered ufunc.at)
+    repeated_rows = len(np.unique(crossover_mutation_rows)) < crossover_mutation_count
+
+    if continuous:
+        if continuous_mutation == "gaussian":
+            perturbation = np.random.randn(rows.size, population.genome_length) * mutation_size
+        else:
+            perturbation = (np.random.rand(rows.size, population.genome_length) * 2 - 1) * mutation_size
+        if repeated_rows:
+            np.add.at(population.genomes, rows, perturbation)
         else:
-            used_indices = []
-            # only mutate one of the genome
-            for j in range(num_elements_to_mutate):
-                sample_index = np.random.randint(low = 0,
-                                                 high = child.genome.size,
-                                                 size = 1)[0]
-                if sample_index in used_indices:
-                    j -= 1
-                else:
-                    child.genome[sample_index] = \
-                        np.absolute(child.genome[sample_index] - 1)
-                    used_indices.append(sample_index)
-
-    assert len(children) == num_parents + num_children
+            population.genomes[rows] += perturbation
+    elif population.packed:
+        # XOR single-bit words into the packed genomes (unbuffered, so repeated rows and words are fine)
+        if mutation_mode == "exact":
+            loci = mutation_loci(rows.size, population.genome_length, num_elements_to_mutate)
+            words, bits = locus_bits(loci)
+            np.bitwise_xor.at(population.genomes, (rows[:, None], words), bits)
+        else:
+            flips = pack_genomes(mutation_mask(rows.size, population.genome_length,
+                                               num_elements_to_mutate, mutation_mode, mutation_rate))
+            np.bitwise_xor.at(population.genomes, rows, flips)
+    else:
+        if mutation_mode == "exact":
+            loci = mutation_loci(rows.size, population.genome_length, num_elements_to_mutate)
+            flips = loci_to_mask(loci, population.genome_length).astype(np.uint8)
+        else:
+            flips = mutation_mask(rows.size, population.genome_length,
+                                  num_elements_to_mutate, mutation_mode, mutation_rate).astype(np.uint8)
+        if repeated_rows:
+            np.bitwise_xor.at(population.genomes, rows, flips)
+        else:
+            population.genomes[rows] ^= flips
+
+    assert indiv_count == num_parents + num_children
 
+    if return_mutations:
+        mutant_loci = None
+        if not continuous and mutation_mode == "exact":
+            mutant_loci = loci[crossover_mutation_count:]
+        return crossover_mutation_count, indiv_count, mutant_rows, mutant_loci
     return crossover_mutation_count, indiv_count
 
 
@@ -132,97 +288,148 @@ def mutation_module(children, parents,
 Selection Modules
 """
 
-def truncation_selection_module(parents, children,
+def stack_draws(rngs, draw):
+    """
+    One draw per run from its own random stream, stacked along a leading run axis
+
+    rngs: (list of numpy Generator or the np.random module) one random stream per run
+    draw: (callable function) that draws from a single stream
+    """
+    return np.stack([draw(rng) for rng in rngs])
+
+
+def truncation_selection_indices(fitness, novelty, rngs,
+                                 downhill_prob,
+                                 num_parents, num_children,
+                                 novelty_selection_prob = 0):
+    """
+    Truncation selection of one or many runs at once
+
+    Every parent slot picks by fitness, or by novelty with probability novelty_selection_prob.
+    Slot i takes the i-th of the best num_parents of its ordering, or, with probability downhill_prob,
+    a random one of the other num_children (distinct within an ordering). Only argpartition is needed:
+    the best num_parents are taken as a set, since the slots taking them are chosen at random anyway.
+
+    parameters:
+    fitness: (numpy array of shape (num_runs, num_parents + num_children)) fitness of every individual
+    novelty: (numpy array of shape (num_runs, num_parents + num_children)) novelty of every individual
+    rngs: (list of numpy Generator or the np.random module) one random stream per run
+
+    returns:
+    selected_indices: (numpy array of shape (num_runs, num_parents)) rows that become the next parents
+    """
+    num_runs = fitness.shape[0]
+    run_indices = np.arange(num_runs)[:, None]
+
+    # the best num_parents of each ordering come first (unordered), the rest after them
+    fitness_order = np.argpartition(-fitness, num_parents - 1, axis = 1)
+    novelty_order = np.argpartition(-novelty, num_parents - 1, axis = 1)
+
+    # selection of novelty order indices or fitness order indices, and of better or bad answers
+    draws = stack_draws(rngs, lambda rng: rng.random((2, num_parents)))
+    use_novelty = draws[:, 0] <= novelty_selection_prob
+    downhill = draws[:, 1] <= downhill_prob
+
+    # stochastic selection of bad answers: distinct random ranks among the num_children worst
+    ranks = np.tile(np.arange(num_parents), (num_runs, 1))
+    if num_children != 0 and np.any(downhill):
+        bad_ranks = stack_draws(rngs, lambda rng: np.stack((rng.permutation(num_children),
+                                                             rng.permutation(num_children))))
+        for ordering, mask in enumerate((~use_novelty, use_novelty)):
+            downhill_mask = downhill & mask
+            draw_number = (np.cumsum(downhill_mask, axis = 1) - 1) % num_children
+            ranks = np.where(downhill_mask,
+                             num_parents + bad_ranks[:, ordering][run_indices, draw_number],
+                             ranks)
+
+    return np.where(use_novelty,
+                    novelty_order[run_indices, ranks],
+                    fitness_order[run_indices, ranks])
+
+
+def truncation_selection_module(population,
                                 downhill_prob,
                                 num_parents, num_children,
                                 novelty_search = False,
                                 novelty_selection_prob = 0):
+    """
+    returns:
+    selected_indices: (numpy array of int) rows of population that become the next parents
+    """
     # selection procedure
     # selection is conducted within the children (to-be-parent) gene pool
 
-    # order index for best children score
-    children_fitness_score = np.zeros(num_parents + num_children)
-    children_novelty_score = np.zeros(num_parents + num_children)
-
-    for i in range(num_parents + num_children):
-        children_fitness_score[i] = copy.deepcopy(children[i].fitness)
-        children_novelty_score[i] = copy.deepcopy(children[i].novelty) # useless if novelty_search is off; reduce if statements
-
-    children_fitness_order_indices = np.flip(np.argsort(children_fitness_score))
-    children_novelty_order_indices = np.flip(np.argsort(children_novelty_score))
-
     # fitness and novelty proportion
     if not novelty_search:
         novelty_selection_prob = 0
 
-    # index selection memory
-    used_fitness_indices = [-1]
-    fitness_bad_index = -1
-    used_novelty_indices = [-1]
-    novelty_bad_index = -1
-
-    # references
-    children_general_order_indices = None
-    used_indices = None
-    for i in range(num_parents):
-        # selection of novelty order indices or fitness order indices
-        if np.random.uniform(low=0.0, high=1.0) > novelty_selection_prob:
-            children_general_order_indices = children_fitness_order_indices
-            used_indices = used_fitness_indices
-            bad_index = fitness_bad_index
-        else:
-            children_general_order_indices = children_novelty_order_indices
-            used_indices = used_novelty_indices
-            bad_index = novelty_bad_index
-
-        # stochastic selection of better answer
-        if np.random.uniform(low=0.0, high=1.0) > downhill_prob:
-            selected_index = copy.deepcopy(
-                children_general_order_indices[i])
-            parents.append(copy.deepcopy(children[selected_index]))
-            used_indices.append(selected_index)
-
-        # stochastic selection of bad answer
-        else:
-            while bad_index in used_indices:
-                bad_index = np.random.randint(num_parents,
-                                              num_parents + num_children,
-                                              size = 1)[0]
-            selected_index = copy.deepcopy(
-                children_general_order_indices[bad_index])
-            parents.append(copy.deepcopy(children[selected_index]))
-            used_indices.append(selected_index)
+    # works on the score arrays directly (no copies of the individuals)
+    return truncation_selection_indices(population.fitness[None, :num_parents + num_children],
+                                        population.novelty[None, :num_parents + num_children],
+                                        [np.random],
+                                        downhill_prob,
+                                        num_parents, num_children,
+                                        novelty_selection_prob)[0]
 
 
+def tournament_scores(population, num_individuals,
+                      tournament_key = "fitness",
+                      novelty_weight = 0.5):
+    """
+    Scalar score per individual that tournaments are won on (higher is better)
 
-def tournament_selection_module(parents, children,
+    tournament_key: (string) "fitness", "novelty", "weighted" ((1 - novelty_weight) * fitness + novelty_weight * novelty)
+                    or "lexicographic" (fitness first, novelty breaks ties)
+    """
+    fitness = population.fitness[:num_individuals]
+    novelty = population.novelty[:num_individuals]
+    if tournament_key == "fitness":
+        return fitness
+    if tournament_key == "novelty":
+        return novelty
+    if tournament_key == "weighted":
+        return (1 - novelty_weight) * fitness + novelty_weight * novelty
+    if tournament_key == "lexicographic":
+        # rank of every individual, sorted by fitness then novelty
+        ranks = np.empty(num_individuals)
+        ranks[np.lexsort((novelty, fitness))] = np.arange(num_individuals)
+        return ranks
+    raise ValueError("unknown tournament_key " + repr(tournament_key) +
+                     ", expected \"fitness\", \"novelty\", \"weighted\" or \"lexicographic\"")
+
+
+def tournament_selection_module(population,
                                 tournament_size, num_tournament_winners,
                                 num_parents, num_children,
-                                novelty_search = False):
-    # tournament selection with replacement
-    # parameters
-    tournament_size = 4
-    num_tournament_winners = 2
-    # num_parents, num_children
-
-    for _ in range(int(np.ceil(num_parents / num_tournament_winners))):
-        tournament_indices = np.random.randint(
-            low = 0,
-            high = num_parents + num_children,
-            size = tournament_size)
-
-        # just pick out the ones in the tournament
-        tournament_scores = np.empty(tournament_size)
-        for i in range(tournament_size):
-            # tournament_scores is in the same order as tournament_indices
-            if novelty_search:
-                tournament_scores[i] = copy.deepcopy(children[tournament_indices[i]].novelty)
-            else:
-                tournament_scores[i] = copy.deepcopy(children[tournament_indices[i]].fitness)
-
-        # flip for highest to lowest
-        tournament_winners = np.flip(np.argsort(tournament_scores))[:num_tournament_winners]
-        for i in tournament_winners:
-            parents.append(copy.deepcopy(children[tournament_indices[i]]))
-    if len(parents) > num_parents:
-        parents = parents[:num_parents]
+                                novelty_search = False,
+                                tournament_key = None,
+                                novelty_weight = 0.5):
+    """
+    Tournament selection with replacement, every tournament at once
+
+    tournament_key: (string) see tournament_scores; defaults to "novelty" if novelty_search else "fitness"
+    novelty_weight: (float) weight of novelty for the "weighted" key
+
+    returns:
+    selected_indices: (numpy array of int) rows of population that become the next parents
+    """
+    if not 0 < num_tournament_winners <= tournament_size:
+        raise ValueError("num_tournament_winners must be between 1 and tournament_size")
+    if tournament_key is None:
+        tournament_key = "novelty" if novelty_search else "fitness"
+
+    scores = tournament_scores(population, num_parents + num_children,
+                               tournament_key, novelty_weight)
+
+    # one row per tournament
+    num_tournaments = int(np.ceil(num_parents / num_tournament_winners))
+    tournament_indices = np.random.randint(low = 0,
+                                           high = num_parents + num_children,
+                                           size = (num_tournaments, tournament_size))
+
+    # the num_tournament_winners best of every tournament (unordered)
+    winner_columns = np.argpartition(-scores[tournament_indices],
+                                     num_tournament_winners - 1,
+                                     axis = 1)[:, :num_tournament_winners]
+    winners = np.take_along_axis(tournament_indices, winner_columns, axis = 1)
+    return winners.ravel()[:num_parents]
@@ -1,45 +1,255 @@
 import numpy as np
+import heapq
+from .bit_packing import packed_length, pack_genomes, unpack_genomes, hamming_distances, allele_counts_packed
 
-def update_archive(solution_archive, individual, max_archive_length):
+class NoveltyIndex:
+    """
+    k-nearest-neighbour index over the novelty archive
+
+    The archive is kept as one matrix: bit-packed uint64 words for binary genomes
+    (distances via popcount of XOR) or a float matrix for continuous genomes.
+    Distances are Euclidean in both cases (sqrt of the Hamming distance for binary genomes),
+    and a whole generation is queried at once. With packed = True, the genomes given to
+    the index are already bit-packed (see pack_genomes).
+    """
+
+    def __init__(self, genome_length, continuous = False, capacity = 16, max_chunk_elements = 2**22, packed = False):
+        self.genome_length = genome_length
+        self.continuous = continuous
+        self.packed = packed
+        self.size = 0
+        self.max_chunk_elements = max_chunk_elements # bounds the temporary (queries, archive, words) arrays
+        if continuous:
+            self.data = np.zeros((capacity, genome_length))
+        else:
+            self.data = np.zeros((capacity, packed_length(genome_length)), dtype = np.uint64)
+        self.novelty = np.zeros(capacity) # novelty of each archived genome when it entered the archive
+
+    def __len__(self):
+        return self.size
+
+    def _encode(self, genomes):
+        if self.continuous:
+            return np.asarray(genomes, dtype = float)
+        if self.packed:
+            return np.asarray(genomes, dtype = np.uint64)
+        return pack_genomes(genomes)
+
+    def append(self, genomes, novelties):
+        """
+        Add rows of genomes (shape (num_genomes, genome_length)) and their novelty at the end of the index
+        """
+        encoded = self._encode(genomes)
+        new_size = self.size + len(encoded)
+        if new_size > len(self.data): # grow geometrically
+            capacity = max(new_size, 2 * len(self.data))
+            data = np.zeros((capacity,) + self.data.shape[1:], dtype = self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            novelty = np.zeros(capacity)
+            novelty[:self.size] = self.novelty[:self.size]
+            self.data, self.novelty = data, novelty
+        self.data[self.size:new_size] = encoded
+        self.novelty[self.size:new_size] = novelties
+        self.size = new_size
+
+    def assign(self, slots, genome, novelty):
+        """
+        Overwrite the archived rows in slots with a single genome
+        """
+        self.data[slots] = self._encode(np.asarray(genome)[None, :])[0]
+        self.novelty[slots] = novelty
+
+    def distances(self, genomes):
+        """
+        returns:
+        distances: (numpy array of shape (num_genomes, size)) Euclidean distance to every archived genome
+        """
+        archive = self.data[:self.size]
+        queries = self._encode(genomes)
+        if not self.continuous:
+            return np.sqrt(hamming_distances(queries, archive))
+        squared = (np.sum(queries ** 2, axis = 1)[:, None] + np.sum(archive ** 2, axis = 1)[None, :]
+                   - 2 * queries @ archive.T)
+        return np.sqrt(np.maximum(squared, 0))
+
+    def query(self, genomes, k):
+        """
+        Novelty of every genome: mean distance to its k nearest archived genomes (all of them if fewer than k)
+
+        parameters:
+        genomes: (numpy array of shape (num_genomes, genome_length)) genomes to be assessed
+        k: (int) number of nearest neighbours
+
+        returns:
+        novelty: (numpy array of shape (num_genomes,))
+        """
+        genomes = np.atleast_2d(genomes)
+        if self.size == 0:
+            return np.zeros(len(genomes))
+
+        k = min(k, self.size)
+        novelty = np.empty(len(genomes))
+        chunk_size = max(1, self.max_chunk_elements // (self.size * self.data.shape[1]))
+        for start in range(0, len(genomes), chunk_size):
+            distances = self.distances(genomes[start:start + chunk_size])
+            # only the k smallest distances are needed, no full sort
+            nearest = np.partition(distances, k - 1, axis = 1)[:, :k]
+            novelty[start:start + chunk_size] = np.mean(nearest, axis = 1)
+        return novelty
+
+
+class NoveltyArchive:
+    """
+    Bounded novelty archive with a pluggable eviction policy
+
+    Only genomes (in a preallocated NoveltyIndex) and their novelty are stored, so memory
+    stays flat however long the run is.
+
+    eviction policies:
+    "novelty": keep the most novel genomes; the least novel one is evicted through a min-heap (O(log n) insertion)
+    "fifo": replace the oldest archived genome
+    "random": reservoir sampling, every genome ever offered has the same chance of being archived
+    """
+
+    eviction_policies = ("novelty", "fifo", "random")
+
+    def __init__(self, capacity, genome_length, continuous = False, eviction_policy = "novelty", packed = False):
+        if eviction_policy not in self.eviction_policies:
+            raise ValueError("unknown eviction_policy " + repr(eviction_policy) +
+                             ", expected one of " + str(self.eviction_policies))
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        self.index = NoveltyIndex(genome_length, continuous, capacity = max(capacity, 1), packed = packed)
+        self.heap = [] # (novelty, slot) of every archived genome, least novel first
+        self.num_offered = 0 # number of genomes ever offered to the archive
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, genomes, novelties):
+        """
+        Offer genomes (in order of assessment) and their novelty to the archive
+        """
+        for genome, novelty in zip(genomes, novelties):
+            self.num_offered += 1
+            if self.capacity == 0:
+                continue
+
+            if len(self.index) < self.capacity:
+                slot = len(self.index)
+                self.index.append(genome[None, :], [novelty])
+                if self.eviction_policy == "novelty":
+                    heapq.heappush(self.heap, (novelty, slot))
+                continue
+
+            if self.eviction_policy == "novelty":
+                if novelty <= self.heap[0][0]:
+                    continue
+                _, slot = heapq.heapreplace(self.heap, (novelty, self.heap[0][1]))
+            elif self.eviction_policy == "fifo":
+                slot = (self.num_offered - 1) % self.capacity
+            else:
+                slot = np.random.randint(0, self.num_offered)
+                if slot >= self.capacity:
+                    continue
+            self.index.assign(slot, genome, novelty)
+
+    def query(self, genomes, k):
+        return self.index.query(genomes, k)
+
+    def get_genomes(self):
+        """
+        returns:
+        genomes: (numpy array of shape (size, genome_length)) archived genomes, from highest to lowest novelty
+        novelties: (numpy array of shape (size,)) their novelty
+        """
+        order = np.argsort(-self.index.novelty[:len(self.index)], kind = "stable")
+        data = self.index.data[order]
+        if not self.index.continuous:
+            data = unpack_genomes(data, self.index.genome_length)
+        return data, self.index.novelty[order]
+
+
+def update_archive(solution_archive, genomes, novelties):
     """
     solution_archive is only stored for calculating novelty before novelty selection
     The size of solution_archive should not matter to num_parent or num_children
+
+    solution_archive: (NoveltyArchive) archive to be updated in place
+    genomes: (numpy array of shape (num_genomes, genome_length)) candidates, in order of assessment
+    novelties: (numpy array of shape (num_genomes,)) novelty of each candidate
     """
+    solution_archive.add(genomes, novelties)
 
-    # solution archive should be ordered from highest to lowest novelty
-    if len(solution_archive) != 0:
-        for i, solution in enumerate(solution_archive):
-            if individual.novelty > solution.novelty:
-                solution_archive.remove(solution)
-                solution_archive.insert(i, individual)
 
+def get_diversity(genomes, metric = "std", genome_length = None):
+    """
+    Genetic diversity of a gene pool, measured in place (the genomes are not copied)
+
+    genomes: (numpy array of shape (..., num_genes, genome_length)) gene pool(s) to be measured
+    metric: (string) "std": mean over the loci of the standard deviation of the alleles across the gene pool
+                     "entropy": mean over the loci of the allele-frequency entropy in bits (binary genomes)
+                     "hamming": mean pairwise Hamming distance between the genomes (binary genomes)
+                     "unique": number of distinct genotypes
+    genome_length: (int) length of the genomes if they are bit-packed (see pack_genomes), None otherwise
+    """
+    if metric not in ("std", "entropy", "hamming", "unique"):
+        raise ValueError("unknown diversity metric: " + str(metric))
+    if metric == "unique":
+        return count_unique_genotypes(genomes, packed = genome_length is not None)
+
+    continuous = genomes.dtype.kind == "f"
+    if continuous:
+        if metric != "std":
+            raise ValueError(metric + " diversity requires binary genomes")
+        # get standard deviation (along each locus), then the average over the loci
+        return np.mean(np.std(genomes, axis = -2), axis = -1)
+
+    # everything else follows from the number of 1 alleles at each locus
+    num_genes = genomes.shape[-2]
+    if genome_length is not None:
+        counts = allele_counts_packed(genomes, genome_length)
     else:
-        solution_archive.append(individual)
-
-
-def get_diversity(gene_pool,
-                  num_genes,
-                  genome_length):
-    # get standard deviation (axis = 0 is rows)
-    diversity = np.empty((num_genes, genome_length))
-    for i in range(num_genes):
-        diversity[i] = gene_pool[i].genome
-    diversity = np.std(diversity, axis = 1)
-    # get average of all of the individual std genes
-    diversity = np.mean(diversity)
-    return diversity
-
-def get_novelty(solution_archive, individual, k):
-    if len(solution_archive) == 0:
-        return 0
-
-    distance_per_solution = np.empty(len(solution_archive))
-    for i, solution in enumerate(solution_archive):
-        distance_per_solution[i] = np.linalg.norm(np.array(solution.genome) - np.array(individual.genome),
-                                                  ord = 2)
-
-    if len(solution_archive) >= k:
-        k_nearest_indices = np.argsort(distance_per_solution)[:k]
-    else:
-        k_nearest_indices = np.argsort(distance_per_solution)
-    return np.mean(distance_per_solution[k_nearest_indices])
+        counts = allele_counts(genomes)
+    frequency = counts / num_genes
+    if metric == "std":
+        return np.mean(np.sqrt(frequency * (1 - frequency)), axis = -1)
+    if metric == "entropy":
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            entropy = -(frequency * np.log2(frequency) + (1 - frequency) * np.log2(1 - frequency))
+        return np.mean(np.nan_to_num(entropy), axis = -1)
+    # each locus differs between c * (n - c) of the n * (n - 1) / 2 pairs of genomes
+    if num_genes < 2:
+        return np.zeros(genomes.shape[:-2])
+    return np.sum(counts * (num_genes - counts), axis = -1) / (num_genes * (num_genes - 1) / 2)
+
+def allele_counts(genomes):
+    """
+    Number of 1 alleles at each locus
+
+    genomes: (numpy array of shape (..., num_genes, genome_length)) binary gene pool(s)
+
+    returns:
+    counts: (numpy array of shape (..., genome_length))
+    """
+    return genomes.sum(axis = -2, dtype = np.int64)
+
+def count_unique_genotypes(genomes, packed = False):
+    """
+    Number of distinct genotypes in the gene pool(s) of shape (..., num_genes, genome_length)
+    (or (..., num_genes, num_words) if packed)
+    """
+    leading_shape = genomes.shape[:-2]
+    if genomes.dtype.kind != "f" and not packed:
+        # binary genomes are compared as bit-packed words
+        genomes = pack_genomes(genomes)
+    pools = genomes.reshape((-1,) + genomes.shape[-2:])
+    counts = np.array([len(np.unique(pool, axis = 0)) for pool in pools])
+    return counts.reshape(leading_shape) if len(leading_shape) != 0 else counts[0]
+
+def get_novelty(solution_archive, genomes, k):
+    """
+    solution_archive: (NoveltyArchive or NoveltyIndex) archive to measure against
+    genomes: (numpy array of shape (num_genomes, genome_length)) genomes to be assessed in one batch
+    """
+    return solution_archive.query(genomes, k)
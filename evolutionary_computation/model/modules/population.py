@@ -0,0 +1,123 @@
+import numpy as np
+from .bit_packing import packed_length, pack_genomes, unpack_genomes
+
+class Population:
+    """
+    Structure-of-arrays population of \\mu + \\lambda individuals
+
+    Genomes are kept in one contiguous (capacity, genome_length) matrix and the
+    fitness, novelty and generation of every individual in parallel 1-D arrays.
+    Rows [0, num_parents) hold the parents and the rows after them the children,
+    so the gene alteration and selection modules only pass index arrays around
+    instead of copying Individual objects.
+
+    With packed = True, binary genomes are stored bit-packed as a (capacity, ceil(genome_length / 64))
+    matrix of uint64 words (see pack_genomes), 8 times smaller than one uint8 per locus.
+    """
+
+    def __init__(self, capacity, genome_length, continuous = False, packed = False):
+        if continuous and packed:
+            raise ValueError("only binary genomes can be bit-packed")
+        self.capacity = capacity
+        self.genome_length = genome_length
+        self.continuous = continuous
+        self.packed = packed
+        if packed:
+            self.genomes = np.zeros((capacity, packed_length(genome_length)), dtype = np.uint64)
+        elif not continuous:
+            self.genomes = np.zeros((capacity, genome_length), dtype = np.uint8)
+        else:
+            self.genomes = np.zeros((capacity, genome_length))
+        self.fitness = np.zeros(capacity)
+        self.novelty = np.zeros(capacity)
+        self.generation = np.zeros(capacity, dtype = int)
+        self.contributions = None # optional cached per-gene fitness contributions (see track_contributions)
+
+    def __len__(self):
+        return self.capacity
+
+    def __getitem__(self, index):
+        return IndividualView(self, index)
+
+    def track_contributions(self, num_genes):
+        """
+        Keep a (capacity, num_genes) matrix of per-gene fitness contributions next to the genomes
+        (used for delta evaluation on N-K landscapes)
+        """
+        self.contributions = np.zeros((self.capacity, num_genes))
+
+    def randomize(self, indices):
+        """
+        Reinitialize the given rows with random genomes (same distribution as Individual)
+        """
+        indices = np.asarray(indices)
+        if self.packed:
+            # same draws as the unpacked population, so both modes follow the same search
+            self.genomes[indices] = pack_genomes(np.random.randint(low = 0, high = 2,
+                                                                   size = (indices.size, self.genome_length)))
+        elif not self.continuous:
+            self.genomes[indices] = np.random.randint(low = 0, high = 2,
+                                                      size = (indices.size, self.genome_length))
+        else:
+            self.genomes[indices] = np.random.rand(indices.size, self.genome_length)
+        self.fitness[indices] = 0
+        self.novelty[indices] = 0
+        self.generation[indices] = 0
+
+    def get_genomes(self, indices):
+        """
+        Genomes of the given rows, one locus per element (unpacked if the population is bit-packed)
+        """
+        if self.packed:
+            return unpack_genomes(self.genomes[indices], self.genome_length)
+        return self.genomes[indices]
+
+    def copy_rows(self, destination, source):
+        """
+        Copy every attribute of the rows in source into the rows in destination
+        """
+        self.genomes[destination] = self.genomes[source]
+        self.fitness[destination] = self.fitness[source]
+        self.novelty[destination] = self.novelty[source]
+        self.generation[destination] = self.generation[source]
+        if self.contributions is not None:
+            self.contributions[destination] = self.contributions[source]
+
+    def select(self, indices):
+        """
+        Move the selected rows (e.g. the survivors of selection) to the front of the population
+
+        parameters:
+        indices: (numpy array of int) rows to keep, in their new order (duplicates allowed)
+        """
+        indices = np.asarray(indices)
+        # fancy indexing on the right hand side copies, so overlapping rows are safe
+        self.copy_rows(np.arange(indices.size), indices)
+
+
+class IndividualView:
+    """
+    Lightweight view of a single row of a Population (no copy of the genome is made)
+    """
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    @property
+    def genome(self):
+        if self.population.packed:
+            return self.population.get_genomes(self.index)
+        return self.population.genomes[self.index]
+
+    @property
+    def fitness(self):
+        return self.population.fitness[self.index]
+
+    @property
+    def novelty(self):
+        return self.population.novelty[self.index]
+
+    @property
+    def generation(self):
+        return self.population.generation[self.index]
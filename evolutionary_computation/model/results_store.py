@@ -0,0 +1,148 @@
+import numpy as np
+import json
+import os
+import shutil
+
+
+class ResultsStore:
+    """
+    Directory-backed store of experiment results
+
+    Every setting (e.g. "Novelty Proportions: 0.1") holds named (num_runs, num_generations) arrays
+    (e.g. "fitness", "diversity"), each saved as one .npy file (float32 by default) that readers
+    memory-map, so loading one setting or one slice of generations never deserializes the rest.
+    index.json maps every setting to its parameters and arrays:
+
+    path/index.json
+    path/<setting directory>/<array name>.npy
+    """
+
+    def __init__(self, path, dtype = np.float32):
+        """
+        parameters:
+        path: (string) directory of the store (created if needed, reopened if it exists)
+        dtype: (numpy dtype) dtype results are stored in
+        """
+        self.path = path
+        self.dtype = dtype
+        self.index_path = os.path.join(path, "index.json")
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as filehandler:
+                self.index = json.load(filehandler)
+        else:
+            os.makedirs(path, exist_ok = True)
+            self.index = {"settings": {}, "num_directories": 0}
+            self._write_index()
+
+    def _write_index(self):
+        with open(self.index_path + ".tmp", "w") as filehandler:
+            json.dump(self.index, filehandler, indent = 2)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def _array_path(self, setting, name):
+        return os.path.join(self.path, self.index["settings"][setting]["directory"], name + ".npy")
+
+    def __contains__(self, setting):
+        return setting in self.index["settings"]
+
+    def settings(self):
+        return list(self.index["settings"])
+
+    def params(self, setting):
+        """
+        returns:
+        params: (dict) parameters the setting was stored with
+        """
+        return self.index["settings"][setting]["params"]
+
+    def arrays(self, setting):
+        """
+        returns:
+        arrays: (dict) shape of every array of the setting, by name
+        """
+        return {name: tuple(shape) for name, shape in self.index["settings"][setting]["arrays"].items()}
+
+    def write(self, setting, arrays, params = None):
+        """
+        Store the arrays of a setting, replacing whatever it held before
+
+        parameters:
+        setting: (string) name of the setting
+        arrays: (dict) name -> numpy array of shape (num_runs, ...) (e.g. fitness_over_time of every run)
+        params: (dict) JSON-serializable parameters of the setting
+        """
+        if setting in self:
+            self.remove(setting)
+        self.append(setting, arrays, params)
+
+    def append(self, setting, arrays, params = None):
+        """
+        Add runs to a setting (created if needed); every array gets the new rows after its existing ones
+        """
+        settings = self.index["settings"]
+        if setting not in settings:
+            # directories are numbered, since setting names need not be valid file names
+            directory = "setting_%04d" % self.index["num_directories"]
+            self.index["num_directories"] += 1
+            os.makedirs(os.path.join(self.path, directory), exist_ok = True)
+            settings[setting] = {"directory": directory, "params": params or {}, "arrays": {}}
+        elif params is not None:
+            settings[setting]["params"].update(params)
+
+        for name, values in arrays.items():
+            values = np.asarray(values, dtype = self.dtype)
+            array_path = self._array_path(setting, name)
+            shapes = settings[setting]["arrays"]
+            if name in shapes:
+                if tuple(shapes[name][1:]) != values.shape[1:]:
+                    raise ValueError("cannot append runs of shape " + str(values.shape[1:]) + " to " + name +
+                                     " of " + repr(setting) + " (runs of shape " + str(tuple(shapes[name][1:])) + ")")
+                num_stored = shapes[name][0]
+            else:
+                num_stored = 0
+            # write the grown array next to the old one, then swap it in atomically
+            grown = np.lib.format.open_memmap(array_path + ".tmp", mode = "w+", dtype = self.dtype,
+                                              shape = (num_stored + len(values),) + values.shape[1:])
+            if num_stored != 0:
+                grown[:num_stored] = np.load(array_path, mmap_mode = "r")
+            grown[num_stored:] = values
+            grown.flush()
+            del grown
+            os.replace(array_path + ".tmp", array_path)
+            shapes[name] = [num_stored + len(values)] + list(values.shape[1:])
+        self._write_index()
+
+    def remove(self, setting):
+        directory = self.index["settings"].pop(setting)["directory"]
+        self._write_index()
+        shutil.rmtree(os.path.join(self.path, directory), ignore_errors = True)
+
+    def load(self, setting, name, runs = None, generations = None):
+        """
+        Lazily load one array of a setting
+
+        parameters:
+        setting: (string) name of the setting
+        name: (string) name of the array
+        runs: (slice, int or numpy array of int) runs to load (default: all)
+        generations: (slice, int or numpy array of int) generations to load (default: all)
+
+        returns:
+        values: (numpy memmap or array) read-only memory-mapped view when runs and generations are slices
+                (no data is read until it is used), an in-memory copy for integer array indices
+        """
+        values = np.load(self._array_path(setting, name), mmap_mode = "r")
+        runs = slice(None) if runs is None else runs
+        generations = slice(None) if generations is None else generations
+        return values[runs, generations]
+
+    def load_all(self, name, settings = None, runs = None, generations = None):
+        """
+        returns:
+        results: (dict) setting -> lazily loaded array name of that setting (see load), for every setting
+                 holding it (e.g. the input_data of plot_mean_and_bootstrapped_ci_over_time)
+        """
+        if settings is None:
+            settings = self.settings()
+        return {setting: self.load(setting, name, runs, generations) for setting in settings
+                if name in self.index["settings"][setting]["arrays"]}
@@ -0,0 +1,178 @@
+import numpy as np
+import json
+import os
+from .modules import pack_genomes, unpack_genomes, packed_length
+
+
+class RunRecorder:
+    """
+    Streaming, append-only log of per-generation records
+
+    Records are buffered in fixed-size chunks; each full chunk is written as one .npy file
+    per field (path/<field>/<chunk>.npy), so memory stays constant however long the run is.
+    Binary best genomes are stored bit-packed. Reopening an existing log appends to it.
+    Use read_run_log to load a field (or a slice of generations) lazily.
+    """
+
+    fields = {"generation": np.int64,
+              "best_fitness": np.float64,
+              "diversity": np.float64,
+              "archive_size": np.int64,
+              "generation_time": np.float64}
+
+    def __init__(self, path, genome_length, continuous = False, chunk_size = 1024):
+        """
+        parameters:
+        path: (string) directory of the log
+        genome_length: (int) length of the recorded genomes
+        continuous: (bool) whether genomes are floating point vectors (stored as is) rather than binary
+        chunk_size: (int) number of generations per chunk file
+        """
+        self.path = path
+        self.genome_length = genome_length
+        self.continuous = continuous
+        self.chunk_size = chunk_size
+
+        metadata_path = os.path.join(path, "metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as filehandler:
+                metadata = json.load(filehandler)
+            if metadata["genome_length"] != genome_length:
+                raise ValueError("the run log at " + path + " records genomes of length " +
+                                 str(metadata["genome_length"]))
+        else:
+            os.makedirs(path, exist_ok = True)
+            with open(metadata_path, "w") as filehandler:
+                json.dump({"genome_length": genome_length,
+                           "continuous": continuous,
+                           "fields": list(self.fields) + ["best_genome"]}, filehandler)
+
+        for field in list(self.fields) + ["best_genome"]:
+            os.makedirs(os.path.join(path, field), exist_ok = True)
+        self.num_chunks = len(_chunk_files(path, "generation"))
+        self.num_flushed = sum(len(np.load(chunk_path, mmap_mode = "r"))
+                               for chunk_path in _chunk_files(path, "generation"))
+
+        self.buffers = {field: np.zeros(chunk_size, dtype = dtype) for field, dtype in self.fields.items()}
+        if continuous:
+            self.buffers["best_genome"] = np.zeros((chunk_size, genome_length))
+        else:
+            self.buffers["best_genome"] = np.zeros((chunk_size, packed_length(genome_length)), dtype = np.uint64)
+        self.num_buffered = 0
+
+    def record(self, generation, best_fitness, best_genome, diversity, archive_size = 0, generation_time = 0.0):
+        """
+        Append the record of one generation; a best_genome of None (no best-so-far yet, e.g. before the
+        first random restart) is recorded as a zero genome with a NaN best_fitness
+        """
+        i = self.num_buffered
+        self.buffers["generation"][i] = generation
+        self.buffers["best_fitness"][i] = best_fitness if best_genome is not None else np.nan
+        self.buffers["diversity"][i] = diversity
+        self.buffers["archive_size"][i] = archive_size
+        self.buffers["generation_time"][i] = generation_time
+        if best_genome is None:
+            self.buffers["best_genome"][i] = 0
+        else:
+            self.buffers["best_genome"][i] = best_genome if self.continuous else pack_genomes(best_genome)
+        self.num_buffered += 1
+        if self.num_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records as a new chunk (atomically, field by field)
+        """
+        if self.num_buffered == 0:
+            return
+        for field, buffer in self.buffers.items():
+            chunk_path = os.path.join(self.path, field, "%08d.npy" % self.num_chunks)
+            with open(chunk_path + ".tmp", "wb") as filehandler:
+                np.save(filehandler, buffer[:self.num_buffered])
+            os.replace(chunk_path + ".tmp", chunk_path)
+        self.num_chunks += 1
+        self.num_flushed += self.num_buffered
+        self.num_buffered = 0
+
+    def num_records(self):
+        return self.num_flushed + self.num_buffered
+
+    def truncate(self, num_records):
+        """
+        Drop every record after the first num_records (e.g. those logged after the checkpoint a run resumes from)
+        """
+        if num_records >= self.num_flushed:
+            self.num_buffered = min(self.num_buffered, num_records - self.num_flushed)
+            return
+        self.num_buffered = 0
+        lengths = [len(np.load(chunk_path, mmap_mode = "r")) for chunk_path in _chunk_files(self.path, "generation")]
+        num_kept = 0 # records in the chunks kept whole
+        num_chunks = 0
+        while num_kept + lengths[num_chunks] <= num_records:
+            num_kept += lengths[num_chunks]
+            num_chunks += 1
+        for field in self.buffers:
+            chunk_paths = _chunk_files(self.path, field)
+            # last chunks first, so that an interruption still leaves a prefix of the log
+            for chunk_path in reversed(chunk_paths[num_chunks + 1:]):
+                os.remove(chunk_path)
+            if num_records > num_kept:
+                chunk_path = chunk_paths[num_chunks]
+                chunk = np.load(chunk_path)[:num_records - num_kept]
+                with open(chunk_path + ".tmp", "wb") as filehandler:
+                    np.save(filehandler, chunk)
+                os.replace(chunk_path + ".tmp", chunk_path)
+            else:
+                os.remove(chunk_paths[num_chunks])
+        self.num_chunks = num_chunks + (num_records > num_kept)
+        self.num_flushed = num_records
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _chunk_files(path, field):
+    field_path = os.path.join(path, field)
+    return sorted(os.path.join(field_path, name) for name in os.listdir(field_path) if name.endswith(".npy"))
+
+
+def read_run_log(path, field, start = None, stop = None):
+    """
+    Read one field of a RunRecorder log; only the chunks overlapping [start, stop) are touched (memory-mapped)
+
+    parameters:
+    path: (string) directory of the log
+    field: (string) "generation", "best_fitness", "diversity", "archive_size", "generation_time" or "best_genome"
+    start, stop: (int) range of records to read (default: all of them)
+
+    returns:
+    values: (numpy array) the records; best genomes are unpacked to shape (num_records, genome_length)
+    """
+    chunks = [np.load(chunk_path, mmap_mode = "r") for chunk_path in _chunk_files(path, field)]
+    lengths = [len(chunk) for chunk in chunks]
+    start, stop, _ = slice(start, stop).indices(sum(lengths))
+
+    values = []
+    offset = 0
+    for chunk, length in zip(chunks, lengths):
+        if offset + length > start and offset < stop:
+            values.append(np.array(chunk[max(start - offset, 0):stop - offset]))
+        offset += length
+
+    if field == "best_genome":
+        with open(os.path.join(path, "metadata.json")) as filehandler:
+            metadata = json.load(filehandler)
+        if metadata["continuous"]:
+            return np.concatenate(values) if len(values) != 0 else np.zeros((0, metadata["genome_length"]))
+        if len(values) == 0:
+            return np.zeros((0, metadata["genome_length"]), dtype = np.uint8)
+        return unpack_genomes(np.concatenate(values), metadata["genome_length"])
+    if len(values) == 0:
+        return np.zeros(0, dtype = RunRecorder.fields[field])
+    return np.concatenate(values)
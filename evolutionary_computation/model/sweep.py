@@ -0,0 +1,212 @@
+import numpy as np
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .evolutionary_algorithm import evolutionary_algorithm
+from .modules.evaluation import function_fingerprint
+
+
+def expand_grid(grid):
+    """
+    Every combination of the values of a parameter grid
+
+    parameters:
+    grid: (dict) parameter name -> list of values (e.g. {"novelty_k": [5, 10], "crossover": [False, True]})
+
+    returns:
+    settings: (list of dict) one dict of parameters per combination (the last parameter varies fastest)
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _describe(value):
+    """
+    JSON-serializable stand-in of a parameter value (e.g. for sweep.json): callables and objects with
+    a fingerprint() (e.g. a Landscape) by qualified name and fingerprint, other objects without a stable
+    repr (e.g. executors) by type
+    """
+    if callable(value):
+        fingerprint = function_fingerprint(value)
+        if fingerprint is None:
+            # bound to an object whose state cannot be digested: the sweep cannot be checked on resume
+            return _unverifiable + getattr(value, "__qualname__", type(value).__qualname__)
+        return fingerprint
+    if hasattr(value, "fingerprint"):
+        fingerprint = value.fingerprint()
+        name = type(value).__module__ + "." + type(value).__qualname__
+        return name + "@" + fingerprint if fingerprint is not None else _unverifiable + name
+    if " at 0x" in repr(value):
+        return type(value).__module__ + "." + type(value).__qualname__
+    return repr(value)
+
+
+_unverifiable = "unverifiable: "
+
+
+# parameters shared by every job, installed in each worker process by _init_sweep_worker
+_sweep_params = None
+
+
+def _init_sweep_worker(params):
+    global _sweep_params
+    _sweep_params = params
+
+
+def _run_job(setting_params, seed, params = None):
+    """
+    One run of evolutionary_algorithm with the shared parameters, the parameters of its setting
+    and its own random stream
+    """
+    if params is None:
+        params = _sweep_params
+    best_solution, best_score, best_generation, fitness_over_time, _, diversity_over_time = evolutionary_algorithm(
+        **dict(params, **setting_params), seed = seed, return_details = True)
+    return {"fitness": fitness_over_time,
+            "diversity": diversity_over_time,
+            "best_solution": best_solution,
+            "best_score": best_score,
+            "best_generation": best_generation}
+
+
+class Sweep:
+    """
+    Resumable grid of independent evolutionary_algorithm runs on a local process pool
+
+    Every (setting, run) job draws from its own stream, SeedSequence(seed, spawn_key = (setting, run)),
+    so results do not depend on the order (or the process) the jobs run in. Each finished job is
+    saved atomically to path/jobs/, and running the sweep again only runs the jobs still missing.
+    """
+
+    def __init__(self, path, settings, num_runs = 20, seed = 0, **params):
+        """
+        parameters:
+        path: (string) directory of the sweep
+        settings: (list of dict) parameters of every setting (e.g. from expand_grid)
+        num_runs: (int) number of independent runs per setting
+        seed: (int) root seed of the sweep
+        params: parameters of evolutionary_algorithm shared by every job (fitness_function, total_generations, ...);
+                they are sent to each worker process once
+        """
+        self.path = path
+        self.settings = [dict(setting) for setting in settings]
+        self.num_runs = num_runs
+        self.seed = seed
+        self.params = params
+        os.makedirs(os.path.join(path, "jobs"), exist_ok = True)
+
+        # an interrupted sweep can only be resumed with the same grid, seed and shared parameters
+        description = {"settings": self.settings, "num_runs": num_runs, "seed": seed, "params": params}
+        description = json.loads(json.dumps(description, default = _describe))
+        description_path = os.path.join(path, "sweep.json")
+        if os.path.exists(description_path):
+            with open(description_path) as filehandler:
+                started = json.load(filehandler)
+            if started != description:
+                raise ValueError("the sweep at " + path + " was started with other settings, num_runs, seed "
+                                 "or parameters")
+            if _unverifiable in json.dumps(started):
+                raise ValueError("the sweep at " + path + " was started with parameters bound to objects without "
+                                 "a fingerprint(), so resuming it cannot be checked: " +
+                                 ", ".join(str(value) for value in started["params"].values()
+                                           if _unverifiable in str(value)))
+        else:
+            with open(description_path, "w") as filehandler:
+                json.dump(description, filehandler, indent = 2)
+
+    def jobs(self):
+        return [(setting, run) for setting in range(len(self.settings)) for run in range(self.num_runs)]
+
+    def _job_path(self, setting, run):
+        return os.path.join(self.path, "jobs", "setting_%04d_run_%04d.npz" % (setting, run))
+
+    def pending_jobs(self):
+        return [job for job in self.jobs() if not os.path.exists(self._job_path(*job))]
+
+    def job_seed(self, setting, run):
+        """
+        returns:
+        seed: (numpy array of uint32) seed of the random stream of the job
+        """
+        return np.random.SeedSequence(self.seed, spawn_key = (setting, run)).generate_state(4)
+
+    def _save_job(self, setting, run, result):
+        job_path = self._job_path(setting, run)
+        with open(job_path + ".tmp", "wb") as filehandler:
+            np.savez(filehandler, **result)
+        os.replace(job_path + ".tmp", job_path)
+
+    def run(self, max_workers = None, mp_context = None, verbose = False):
+        """
+        Run every pending job (max_workers = 1 runs them one by one in this process)
+
+        parameters:
+        max_workers: (int) number of worker processes (default: one per core)
+        mp_context: (multiprocessing context) start method of the workers
+        verbose: (bool) print every finished job
+
+        returns:
+        num_jobs: (int) number of jobs run
+        """
+        pending = self.pending_jobs()
+        if max_workers == 1:
+            for setting, run in pending:
+                self._save_job(setting, run, _run_job(self.settings[setting], self.job_seed(setting, run), self.params))
+                if verbose:
+                    print("Setting " + str(setting) + ", run " + str(run) + " done")
+            return len(pending)
+
+        with ProcessPoolExecutor(max_workers = max_workers,
+                                 mp_context = mp_context,
+                                 initializer = _init_sweep_worker,
+                                 initargs = (self.params,)) as executor:
+            futures = {executor.submit(_run_job, self.settings[setting], self.job_seed(setting, run)): (setting, run)
+                       for setting, run in pending}
+            # saved as they finish, so an interruption only loses the jobs still running
+            for future in as_completed(futures):
+                setting, run = futures[future]
+                self._save_job(setting, run, future.result())
+                if verbose:
+                    print("Setting " + str(setting) + ", run " + str(run) + " done")
+        return len(pending)
+
+    def results(self, setting):
+        """
+        Results of every finished run of a setting
+
+        returns:
+        results: (dict) "fitness", "diversity": (numpy array of shape (num_runs, total_generations)) records of
+                 every run (runs stopped early carry their last record forward); "best_solution", "best_score",
+                 "best_generation": best-so-far of every run
+        """
+        runs = [np.load(self._job_path(setting, run)) for run in range(self.num_runs)
+                if os.path.exists(self._job_path(setting, run))]
+        results = {}
+        for name in ("fitness", "diversity"):
+            num_generations = max((len(run[name]) for run in runs), default = 0)
+            records = np.empty((len(runs), num_generations))
+            for i, run in enumerate(runs):
+                records[i, :len(run[name])] = run[name]
+                records[i, len(run[name]):] = run[name][-1] if len(run[name]) != 0 else np.nan
+            results[name] = records
+        for name in ("best_solution", "best_score", "best_generation"):
+            results[name] = np.array([run[name] for run in runs])
+        return results
+
+    def to_store(self, results_store, names = None):
+        """
+        Write the fitness and diversity records of every setting to a ResultsStore
+
+        parameters:
+        results_store: (ResultsStore) store to write to (each setting replaces its previous results)
+        names: (list of string) name of every setting in the store (default: its parameters)
+        """
+        for setting, setting_params in enumerate(self.settings):
+            name = names[setting] if names is not None else \
+                "; ".join(key + ": " + str(value) for key, value in setting_params.items())
+            results = self.results(setting)
+            results_store.write(name,
+                                {"fitness": results["fitness"], "diversity": results["diversity"]},
+                                params = json.loads(json.dumps(dict(setting_params, num_runs = self.num_runs,
+                                                                    seed = self.seed), default = repr)))
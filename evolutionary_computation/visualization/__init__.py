@@ -1 +1,26 @@
-from .seaborn_plot import *
+import importlib
+
+# module -> public names it provides; plotting (matplotlib) is only imported when first used,
+# so that the bootstrap alone does not pay for it
+_public_names = {
+    "bootstrap": ("bootstrap_ci", "resample_counts"),
+    "seaborn_plot": ("plot_mean_and_bootstrapped_ci_over_time",),
+}
+
+_modules = {name: module for module, names in _public_names.items() for name in names}
+
+__all__ = sorted(_modules)
+
+
+def __getattr__(name):
+    if name in _public_names:
+        return importlib.import_module("." + name, __name__)
+    if name not in _modules:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+    value = getattr(importlib.import_module("." + _modules[name], __name__), name)
+    globals()[name] = value # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_public_names))
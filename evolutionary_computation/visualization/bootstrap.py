@@ -0,0 +1,138 @@
+import numpy as np
+import functools
+import hashlib
+import os
+from collections import OrderedDict
+from scipy.special import ndtr, ndtri
+
+"""
+Vectorized Bootstrap Confidence Intervals
+
+Every column (e.g. generation) of a (runs, ...) array is resampled with the same
+(n_samples, runs) resampling: each resample is a row of run counts, so the bootstrap means
+of all columns are one matrix product. Columns are processed in chunks to bound memory.
+"""
+
+# confidence intervals already computed, keyed by a hash of the data and the parameters
+_ci_cache = OrderedDict()
+_ci_cache_size = 256
+
+
+def resample_counts(n_samples, num_runs, seed = None):
+    """
+    returns:
+    counts: (numpy array of shape (n_samples, num_runs)) how often each run is drawn in each resample
+    """
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, num_runs, size = (n_samples, num_runs))
+    flat = (np.arange(n_samples)[:, None] * num_runs + indices).ravel()
+    return np.bincount(flat, minlength = n_samples * num_runs).reshape(n_samples, num_runs).astype(float)
+
+
+def _bootstrap_chunk(data, counts, alpha = 0.05, method = "bca"):
+    """
+    Confidence intervals of the mean of every column of data (shape (num_runs, num_columns))
+    """
+    num_runs = data.shape[0]
+    n_samples = counts.shape[0]
+    statistics = np.sort(counts @ data / num_runs, axis = 0) # (n_samples, num_columns) bootstrap means
+    levels = np.array([alpha / 2, 1 - alpha / 2])
+
+    if method == "percentile":
+        percentiles = np.broadcast_to(levels[:, None], (2, data.shape[1]))
+    else:
+        # bias correction: share of bootstrap means below the sample mean
+        mean = np.mean(data, axis = 0)
+        z0 = ndtri(np.sum(statistics < mean, axis = 0) / n_samples)
+        # acceleration from the jackknife means (each run left out once)
+        jackknife = (np.sum(data, axis = 0) - data) / max(num_runs - 1, 1)
+        deviations = np.mean(jackknife, axis = 0) - jackknife
+        denominator = 6 * np.sum(deviations ** 2, axis = 0) ** 1.5
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            acceleration = np.where(denominator != 0, np.sum(deviations ** 3, axis = 0) / denominator, 0)
+            z = ndtri(levels)[:, None]
+            percentiles = ndtr(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+        # constant columns: every bootstrap mean is the same, any rank will do
+        percentiles = np.nan_to_num(percentiles, nan = 0.5)
+
+    ranks = np.round((n_samples - 1) * percentiles).astype(int)
+    return np.take_along_axis(statistics, ranks, axis = 0)
+
+
+def _cache_key(data, n_samples, alpha, method, seed):
+    digest = hashlib.sha1(np.ascontiguousarray(data).view(np.uint8))
+    digest.update(repr((data.shape, str(data.dtype), n_samples, alpha, method, seed)).encode())
+    return digest.hexdigest()
+
+
+def bootstrap_ci(data,
+                 n_samples = 20000,
+                 alpha = 0.05,
+                 method = "bca",
+                 axis = 0,
+                 seed = 0,
+                 chunk_size = None,
+                 executor = None,
+                 cache = True,
+                 cache_dir = None):
+    """
+    Bootstrap confidence intervals of the mean along an axis, for every other index at once
+
+    parameters:
+    data: (numpy array) samples (e.g. of shape (num_runs, num_generations))
+    n_samples: (int) number of bootstrap resamples
+    alpha: (float) the interval covers 1 - alpha
+    method: (string) "bca" (bias-corrected and accelerated, as scikits.bootstrap.ci) or "percentile"
+    axis: (int) axis of the samples (e.g. the runs)
+    seed: (int) seed of the resampling (the same seed gives the same intervals)
+    chunk_size: (int) number of columns resampled at once (default: about 2**22 bootstrap means per chunk)
+    executor: (executor) concurrent.futures-style executor the chunks are spread over (this process if None)
+    cache: (bool) reuse intervals already computed for the same data and parameters
+    cache_dir: (string) directory where intervals are also cached as .npy files (e.g. across re-plots)
+
+    returns:
+    confidence_intervals: (numpy array of shape (2,) + shape of data without axis) lower and upper bounds
+    """
+    if method not in ("bca", "percentile"):
+        raise ValueError("unknown method " + repr(method) + ", expected \"bca\" or \"percentile\"")
+    data = np.moveaxis(np.asarray(data, dtype = float), axis, 0)
+    output_shape = (2,) + data.shape[1:]
+
+    key = _cache_key(data, n_samples, alpha, method, seed) if cache else None
+    if key is not None:
+        if key in _ci_cache:
+            _ci_cache.move_to_end(key)
+            return _ci_cache[key].copy()
+        cache_path = os.path.join(cache_dir, key + ".npy") if cache_dir is not None else None
+        if cache_path is not None and os.path.exists(cache_path):
+            confidence_intervals = np.load(cache_path)
+            _insert(key, confidence_intervals)
+            return confidence_intervals.copy()
+
+    columns = data.reshape(data.shape[0], -1)
+    counts = resample_counts(n_samples, columns.shape[0], seed)
+    if chunk_size is None:
+        chunk_size = max(1, 2**22 // n_samples)
+    chunks = [columns[:, start:start + chunk_size] for start in range(0, columns.shape[1], chunk_size)]
+
+    task = functools.partial(_bootstrap_chunk, counts = counts, alpha = alpha, method = method)
+    if executor is not None:
+        results = list(executor.map(task, chunks))
+    else:
+        results = [task(chunk) for chunk in chunks]
+    if len(results) == 0:
+        return np.zeros(output_shape)
+    confidence_intervals = np.concatenate(results, axis = 1).reshape(output_shape)
+
+    if key is not None:
+        _insert(key, confidence_intervals)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok = True)
+            np.save(cache_path, confidence_intervals)
+    return confidence_intervals.copy()
+
+
+def _insert(key, confidence_intervals):
+    _ci_cache[key] = confidence_intervals
+    if len(_ci_cache) > _ci_cache_size:
+        _ci_cache.popitem(last = False)
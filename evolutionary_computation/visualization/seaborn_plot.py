@@ -1,15 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
-try:
-    plt.style.use('seaborn')
-except:
-    plt.style.use('seaborn-v0_8')
-
-import scikits.bootstrap as bootstrap
 import warnings
-warnings.filterwarnings('ignore') # Danger, Will Robinson! (not a scalable hack, and may surpress other helpful warning other than for ill-conditioned bootstrapped CI distributions)
+from .bootstrap import bootstrap_ci
 
-import scipy.stats # for finding statistical significance
+# applied while plotting only, so that importing this module leaves matplotlib's global style alone
+plot_style = "seaborn-v0_8" if "seaborn-v0_8" in plt.style.available else "seaborn"
 
 def plot_mean_and_bootstrapped_ci_over_time(input_data = None,
                                             n_samples = 20000,
@@ -17,45 +12,51 @@ def plot_mean_and_bootstrapped_ci_over_time(input_data = None,
                                             x_label = "Generations",
                                             y_label = "Fitness",
                                             fig_size_change = False,
-                                            figure_path = None):
+                                            figure_path = None,
+                                            executor = None,
+                                            cache_dir = None):
     """
     parameters:
     input_data: (numpy array of shape {dict_key: (max_k, max_gen)}) solution metric to plot
     name: (string) name for legend
     x_label: (string) x axis label
     y_label: (string) y axis label
+    n_samples: (int) number of bootstrap resamples of the confidence intervals
+    executor: (executor) concurrent.futures-style executor the bootstrap is spread over (see bootstrap_ci)
+    cache_dir: (string) directory caching the confidence intervals, so that re-plotting the same results is instant
 
     returns:
     None
     """
-    if fig_size_change:
-        fig = plt.gcf()
-        fig.set_size_inches(18.5, 10.5)
+    with plt.style.context(plot_style):
+        if fig_size_change:
+            fig = plt.gcf()
+            fig.set_size_inches(18.5, 10.5)
 
-    for key in input_data:
-        recorded_matrix = input_data[key]
-        max_k = recorded_matrix.shape[0]
-        max_gen = recorded_matrix.shape[1]
-        confidence_intervals = np.empty((max_gen, 2))
-        # confidence interval
-        for gen in range(max_gen):
-            confidence_intervals[gen] = np.array(bootstrap.ci(
-                data = recorded_matrix[:, gen],
-                statfunction = np.mean,
-                n_samples = n_samples))
-        plt.plot(np.mean(recorded_matrix, axis = 0), label = key)
-        plt.fill_between(np.arange(max_gen),
-                         confidence_intervals[:, 0],
-                         confidence_intervals[:, 1],
-                         alpha = 0.2)
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
-    plt.legend()
+        for key in input_data:
+            recorded_matrix = input_data[key]
+            max_gen = recorded_matrix.shape[1]
+            # confidence interval of every generation at once
+            # ill-conditioned bootstrap distributions (e.g. constant generations) only warn, for this plot alone
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                confidence_intervals = bootstrap_ci(recorded_matrix,
+                                                    n_samples = n_samples,
+                                                    executor = executor,
+                                                    cache_dir = cache_dir)
+            plt.plot(np.mean(recorded_matrix, axis = 0), label = key)
+            plt.fill_between(np.arange(max_gen),
+                             confidence_intervals[0],
+                             confidence_intervals[1],
+                             alpha = 0.2)
+        plt.xlabel(x_label)
+        plt.ylabel(y_label)
+        plt.legend()
 
-    if figure_path == None:
-        plt.show()
-        plt.close()
+        if figure_path == None:
+            plt.show()
+            plt.close()
 
-    else:
-        plt.savefig(figure_path)
-        plt.close()
+        else:
+            plt.savefig(figure_path)
+            plt.close()
@@ -1,12 +1,5 @@
 import numpy as np
-from evolutionary_computation import *
-import pickle
-import os
-from copy import deepcopy
-
-experiment_results = {}
-#solutions_results = {}
-diversity_results = {}
+from evolutionary_computation import Landscape, ResultsStore, Sweep
 
 num_runs = 20
 total_generations = 100
@@ -20,9 +13,13 @@ max_archive_length = 100
 
 n = bit_string_length
 k = bit_string_length-1
+np.random.seed(0) # the landscape only; every run has its own random stream
 fitness_landscape = Landscape(n, k)
+# 2**15 genomes: every fitness evaluation becomes a table lookup
+fitness_landscape.precompute()
 
-np.random.seed(0)
+# one store for every setting: index.json plus float32 .npy arrays of shape (num_runs, total_generations)
+results_path = "assignment_results/nk_" + str(n) + "_" + str(k) + "_novelty_k_" + str(novelty_k)
 
 experiment_settings = {
     "novelty_selection": [False, True, True],
@@ -30,87 +27,32 @@ experiment_settings = {
     "num": 3
 }
 
-for num in range(experiment_settings["num"]):
-    fitness_records = np.empty((num_runs, total_generations))
-    diversity_records = np.empty((num_runs, total_generations))
-    solution_records = []
-
-    for i in range(num_runs):
-        print("Run " + str(i))
-        f, s, d = evolutionary_algorithm(
-            fitness_function = fitness_landscape.get_fitness,
-            total_generations = total_generations,
-            num_parents = num_parents,
-            num_children = num_children,
-            continuous = False,
-            genome_length = bit_string_length,
-            num_elements_to_mutate = num_elements_to_mutate,
-            crossover = False,
-            restart_every = 0,
-            downhill_prob = 0.01,
-            tournament_selection = False,
-            novelty_selection = experiment_settings["novelty_selection"][num],
-            novelty_k = novelty_k,
-            novelty_selection_prop = \
-                experiment_settings["novelty_selection_prop"][num],
-            max_archive_length = max_archive_length,
-            return_details = False)
-        fitness_records[i] = f
-        diversity_records[i] = d
-        solution_records.append(s)
-
-    tag = "NK: " + str(n) + ", " + str(k) + "; " + \
-        "Novelty K: " + str(novelty_k) + \
-        "; " + "Novelty Proportions: " + \
-        str(experiment_settings["novelty_selection_prop"][num])
-    experiment_results[tag] = deepcopy(fitness_records)
-    # novelty_solutions_results[tag] = deepcopy(solution_records)
-    diversity_results[tag] = deepcopy(diversity_records)
-
-os.makedirs("assignment_results", exist_ok = True)
-
-for novelty_selection_prop in experiment_settings["novelty_selection_prop"]:
-
-    tag = "NK: " + str(n) + ", " + str(k) + "; " + \
-        "Novelty K: " + str(novelty_k) + \
-        "; " + "Novelty Proportions: " + \
-        str(novelty_selection_prop)
-
-    with open("assignment_results/nk_" + str(n) + "_" + str(k) + \
-              "_novelty_k_" + str(novelty_k) + \
-              "_novelty_prop_" + str(novelty_selection_prop) + \
-              "_experiment_results.pkl", 'wb') as filehandler:
-        pickle.dump(experiment_results[tag], filehandler)
-
-    # too much storage
-    # with open("assignment_results/nk_" + str(n) + "_" + str(k) + "_novelty_k_" + str(novelty_k) + \
-    #           "_novelty_prop_" + str(novelty_selection_prop) + "_solutions_results.pkl", 'wb') as filehandler:
-    #     pickle.dump(novelty_solutions_results[tag], filehandler)
-
-    with open("assignment_results/nk_" + str(n) + "_" + str(k) + \
-              "_novelty_k_" + str(novelty_k) + \
-              "_novelty_prop_" + str(novelty_selection_prop) + \
-              "_diversity_results.pkl", 'wb') as filehandler:
-        pickle.dump(diversity_results[tag], filehandler)
-
-
-experiment_results = {}
-diversity_results = {}
-
-for novelty_selection_prop in experiment_settings["novelty_selection_prop"]:
-    tag = "NK: " + str(n) + ", " + str(k) + "; " + \
-        "Novelty K: " + str(novelty_k) + \
-        "; " + "Novelty Proportions: " + \
-        str(novelty_selection_prop)
-
-    with open("assignment_results/nk_" + str(n) + "_" + str(k) + \
-              "_novelty_k_" + str(novelty_k) + \
-              "_novelty_prop_" + str(novelty_selection_prop) + \
-              "_experiment_results.pkl", 'rb') as filehandler:
-        experiment_results[tag] = pickle.load(filehandler)
-
-    with open("assignment_results/nk_" + str(n) + "_" + str(k) + \
-              "_novelty_k_" + str(novelty_k) + \
-              "_novelty_prop_" + str(novelty_selection_prop) + \
-              "_diversity_results.pkl", 'rb') as filehandler:
-        diversity_results[tag] = pickle.load(filehandler)
+if __name__ == "__main__": # worker processes may import this script
+    # every (setting, run) is an independent job on a process pool (one worker per core);
+    # finished jobs are kept in results_path/sweep, so an interrupted sweep resumes where it stopped
+    sweep = Sweep(results_path + "/sweep",
+                  [{"novelty_selection": experiment_settings["novelty_selection"][num],
+                    "novelty_selection_prop": experiment_settings["novelty_selection_prop"][num]}
+                   for num in range(experiment_settings["num"])],
+                  num_runs = num_runs,
+                  seed = 0,
+                  fitness_function = fitness_landscape.get_fitness,
+                  batch_fitness_function = fitness_landscape.get_fitness_batch,
+                  total_generations = total_generations,
+                  num_parents = num_parents,
+                  num_children = num_children,
+                  genome_length = bit_string_length,
+                  num_elements_to_mutate = num_elements_to_mutate,
+                  crossover = False,
+                  downhill_prob = 0.01,
+                  novelty_k = novelty_k,
+                  max_archive_length = max_archive_length)
+    print("Running " + str(len(sweep.pending_jobs())) + " of " + str(len(sweep.jobs())) + " runs")
+    sweep.run(verbose = True)
+
+    tags = ["NK: " + str(n) + ", " + str(k) + "; " + \
+            "Novelty K: " + str(novelty_k) + \
+            "; " + "Novelty Proportions: " + \
+            str(experiment_settings["novelty_selection_prop"][num])
+            for num in range(experiment_settings["num"])]
+    sweep.to_store(ResultsStore(results_path), tags)
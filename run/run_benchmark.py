@@ -0,0 +1,228 @@
+import numpy as np
+from evolutionary_computation import (EvolutionaryAlgorithm, FitnessCache, Landscape, NoveltyArchive, Population,
+                                      crossover_module, evolutionary_algorithm, get_diversity, get_novelty,
+                                      mutation_module, tournament_selection_module, truncation_selection_module,
+                                      update_archive)
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+"""
+Benchmark of every evolutionary operator and of whole generations
+
+Each operator is timed (median over repeats) and its peak memory traced once, for every
+(mu, lambda, L, K, archive size) of the grid. Results are written as a JSON baseline;
+given a previous baseline, every operator slower by more than the threshold is flagged
+and the script exits with status 1. Before timing, packed and unpacked runs, with and without
+a FitnessCache or delta evaluation, must give identical results (status 1 otherwise).
+
+python run/run_benchmark.py --output benchmark_results/baseline.json
+python run/run_benchmark.py --baseline benchmark_results/baseline.json --threshold 0.2
+"""
+
+benchmark_settings = {
+    "num_parents": [10, 100],
+    "num_children": [10, 100], # paired with num_parents
+    "genome_length": [15, 256, 1024],
+    "k": [2, 8],
+    "max_archive_length": [100, 1000]
+}
+
+quick_settings = {
+    "num_parents": [10],
+    "num_children": [10],
+    "genome_length": [15, 256],
+    "k": [2],
+    "max_archive_length": [100]
+}
+
+
+def time_operation(operation, repeats, min_seconds = 0.05):
+    """
+    returns:
+    seconds: (float) median wall-clock time of one call
+    peak_memory: (int) peak bytes allocated during one (separate, traced) call
+    """
+    operation() # warm up
+    calls = 1
+    start = time.perf_counter()
+    operation()
+    single = time.perf_counter() - start
+    # batch very fast calls so that each timed sample lasts long enough to be measured
+    if single < min_seconds / repeats:
+        calls = int(np.ceil(min_seconds / repeats / max(single, 1e-9)))
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        samples.append((time.perf_counter() - start) / calls)
+
+    tracemalloc.start()
+    operation()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(samples)), int(peak_memory)
+
+
+def benchmark_case(num_parents, num_children, genome_length, k, max_archive_length, repeats):
+    np.random.seed(0)
+    landscape = Landscape(genome_length, min(k, genome_length - 1))
+    population_size = num_parents + num_children
+
+    population = Population(population_size, genome_length)
+    population.randomize(np.arange(population_size))
+    population.fitness[:] = landscape.get_fitness_batch(population.genomes)
+    population.novelty[:] = np.random.rand(population_size)
+
+    # a full archive, so that update_archive runs in its steady (evicting) state
+    archive = NoveltyArchive(max_archive_length, genome_length)
+    archive_genomes = np.random.randint(0, 2, size = (max_archive_length, genome_length)).astype(np.uint8)
+    update_archive(archive, archive_genomes, np.random.rand(max_archive_length))
+    children_genomes = population.genomes[num_parents:]
+    children_novelty = np.random.rand(num_children)
+
+    operations = {
+        "crossover_module": lambda: crossover_module(population, 1.0, num_parents, num_children,
+                                                     0, num_parents, "k_point", 2),
+        "mutation_module": lambda: mutation_module(population, 0, 0, num_parents, num_children,
+                                                   0, num_parents, 1),
+        "truncation_selection_module": lambda: truncation_selection_module(population, 0.2,
+                                                                           num_parents, num_children,
+                                                                           True, 0.5),
+        "tournament_selection_module": lambda: tournament_selection_module(population, 4, 2,
+                                                                           num_parents, num_children),
+        "get_novelty": lambda: get_novelty(archive, children_genomes, 5),
+        "update_archive": lambda: update_archive(archive, children_genomes, children_novelty),
+        "get_diversity": lambda: get_diversity(population.genomes),
+        "Landscape.get_fitness": lambda: landscape.get_fitness(population.genomes[0]),
+        "Landscape.get_fitness_batch": lambda: landscape.get_fitness_batch(population.genomes),
+    }
+
+    results = {}
+    for name, operation in operations.items():
+        seconds, peak_memory = time_operation(operation, repeats)
+        results[name] = {"seconds": seconds, "peak_memory": peak_memory}
+
+    # whole generations of the engine (fitness, novelty, diversity, selection, crossover, mutation)
+    engine = EvolutionaryAlgorithm(batch_fitness_function = landscape.get_fitness_batch,
+                                   total_generations = 10**5, # more than are ever stepped here
+                                   num_parents = num_parents,
+                                   num_children = num_children,
+                                   genome_length = genome_length,
+                                   crossover = True,
+                                   max_archive_length = max_archive_length,
+                                   seed = 0)
+    seconds, peak_memory = time_operation(engine.step, repeats)
+    results["generation"] = {"seconds": seconds, "peak_memory": peak_memory,
+                             "generations_per_second": 1 / seconds}
+    return results
+
+
+def check_consistency(genome_length = 70, k = 3):
+    """
+    returns:
+    mismatches: (list of string) configurations whose fitness_over_time differs from the unpacked, uncached run
+    """
+    np.random.seed(0)
+    landscape = Landscape(genome_length, k)
+    mismatches = []
+    # crossover_ratio = 1 leaves no mutated parents to delta-evaluate
+    for crossover_ratio in (0.6, 1.0):
+        params = {"total_generations": 40, "num_parents": 20, "num_children": 20, "genome_length": genome_length,
+                  "crossover": True, "crossover_ratio": crossover_ratio, "seed": 0}
+        reference = evolutionary_algorithm(batch_fitness_function = landscape.get_fitness_batch, **params)[0]
+
+        for packed_genomes in (False, True):
+            cache = FitnessCache(landscape.get_fitness,
+                                 landscape.get_fitness_packed if packed_genomes else landscape.get_fitness_batch)
+            runs = {"uncached": {"batch_fitness_function": landscape.get_fitness_batch,
+                                 "packed_fitness_function": landscape.get_fitness_packed if packed_genomes else None},
+                    "cached": {"fitness_function": cache,
+                               "batch_fitness_function": landscape.get_fitness_batch if packed_genomes else cache.evaluate_batch,
+                               "packed_fitness_function": cache.evaluate_batch if packed_genomes else None},
+                    "delta": {"delta_landscape": landscape}}
+            for name, functions in runs.items():
+                fitness_over_time = evolutionary_algorithm(packed_genomes = packed_genomes, **functions, **params)[0]
+                if not np.array_equal(fitness_over_time, reference):
+                    mismatches.append(("packed" if packed_genomes else "unpacked") + ", " + name +
+                                      ", crossover_ratio " + str(crossover_ratio))
+    return mismatches
+
+
+def case_name(num_parents, num_children, genome_length, k, max_archive_length):
+    return "mu_%d_lambda_%d_L_%d_K_%d_archive_%d" % (num_parents, num_children, genome_length, k, max_archive_length)
+
+
+def compare(results, baseline, threshold):
+    """
+    returns:
+    regressions: (list of string) operators slower than in baseline by more than threshold (e.g. 0.2 = 20%)
+    """
+    regressions = []
+    for case, operations in results["results"].items():
+        for name, measurement in operations.items():
+            previous = baseline["results"].get(case, {}).get(name)
+            if previous is None:
+                continue
+            ratio = measurement["seconds"] / previous["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append("%s %s: %.3g s -> %.3g s (%+.0f%%)" % (case, name, previous["seconds"],
+                                                                         measurement["seconds"], (ratio - 1) * 100))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark of the evolutionary operators")
+    parser.add_argument("--output", default = "benchmark_results/benchmark.json")
+    parser.add_argument("--baseline", default = None, help = "previous results to compare against")
+    parser.add_argument("--threshold", type = float, default = 0.2, help = "relative slowdown flagged as a regression")
+    parser.add_argument("--repeats", type = int, default = 7)
+    parser.add_argument("--quick", action = "store_true", help = "small grid only")
+    args = parser.parse_args()
+
+    mismatches = check_consistency()
+    if len(mismatches) != 0:
+        print("Results differ from the unpacked, uncached run: " + "; ".join(mismatches))
+        sys.exit(1)
+
+    settings = quick_settings if args.quick else benchmark_settings
+    results = {"metadata": {"python": sys.version.split()[0],
+                            "numpy": np.__version__,
+                            "platform": platform.platform(),
+                            "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+               "results": {}}
+
+    for (num_parents, num_children), genome_length, k, max_archive_length in itertools.product(
+            zip(settings["num_parents"], settings["num_children"]),
+            settings["genome_length"], settings["k"], settings["max_archive_length"]):
+        case = case_name(num_parents, num_children, genome_length, k, max_archive_length)
+        print(case)
+        results["results"][case] = benchmark_case(num_parents, num_children, genome_length, k,
+                                                  max_archive_length, args.repeats)
+        for name, measurement in results["results"][case].items():
+            print("    %-30s %10.3f ms %10.1f KiB" % (name, measurement["seconds"] * 1e3,
+                                                      measurement["peak_memory"] / 1024))
+        print("    %-30s %10.1f" % ("generations / s", results["results"][case]["generation"]["generations_per_second"]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok = True)
+    with open(args.output, "w") as filehandler:
+        json.dump(results, filehandler, indent = 2)
+    print("Results: " + args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as filehandler:
+            baseline = json.load(filehandler)
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) != 0:
+            print("Regressions (more than %d%% slower than %s):" % (args.threshold * 100, args.baseline))
+            for regression in regressions:
+                print("    " + regression)
+            sys.exit(1)
+        print("No regressions against " + args.baseline)
@@ -0,0 +1,90 @@
+import numpy as np
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+"""
+Import-time benchmark of the package
+
+Every import is timed (median over repeats) in a fresh interpreter, together with the heavy
+modules it loaded. The core imports (what run scripts and worker processes need) must stay
+within the start-up budget and must not load the plotting stack; otherwise the script exits
+with status 1.
+
+python run/run_import_benchmark.py
+python run/run_import_benchmark.py --budget 0.3 --output benchmark_results/imports.json
+"""
+
+# import statement -> whether it is on the core path (budgeted, no plotting stack)
+import_statements = {
+    "import evolutionary_computation": True,
+    "from evolutionary_computation import *": True,
+    "from evolutionary_computation import Landscape": True,
+    "from evolutionary_computation import evolutionary_algorithm": True,
+    "from evolutionary_computation import Landscape, evolutionary_algorithm, Sweep, ResultsStore": True,
+    "from evolutionary_computation import bootstrap_ci": False,
+    "from evolutionary_computation import plot_mean_and_bootstrapped_ci_over_time": False,
+}
+
+heavy_modules = ("matplotlib", "scipy", "scikits")
+
+# run in the fresh interpreter: time the import, then list the heavy modules it loaded
+measure = """
+import sys, time, json
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds,
+                  "heavy_modules": sorted(set(name.split(".")[0] for name in sys.modules) & set(%r))}))
+"""
+
+
+def time_import(statement, repeats):
+    """
+    returns:
+    seconds: (float) median time of the import in a fresh interpreter (interpreter start-up excluded)
+    heavy_modules: (list of string) heavy top-level modules loaded by the import
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH = os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", measure % (statement, heavy_modules)],
+                                capture_output = True, text = True, check = True, env = environment).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+    return float(np.median(samples)), result["heavy_modules"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Import-time benchmark of the package")
+    parser.add_argument("--budget", type = float, default = 0.5, help = "seconds allowed for every core import")
+    parser.add_argument("--repeats", type = int, default = 5)
+    parser.add_argument("--output", default = None, help = "JSON file the results are written to")
+    args = parser.parse_args()
+
+    results = {}
+    violations = []
+    for statement, core in import_statements.items():
+        seconds, loaded = time_import(statement, args.repeats)
+        results[statement] = {"seconds": seconds, "heavy_modules": loaded, "core": core}
+        print("%-90s %8.1f ms  %s" % (statement, seconds * 1e3, ", ".join(loaded)))
+        if core and seconds > args.budget:
+            violations.append("%s: %.3g s (budget %.3g s)" % (statement, seconds, args.budget))
+        if core and len(loaded) != 0:
+            violations.append("%s: loads %s" % (statement, ", ".join(loaded)))
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok = True)
+        with open(args.output, "w") as filehandler:
+            json.dump({"budget": args.budget, "results": results}, filehandler, indent = 2)
+        print("Results: " + args.output)
+
+    if len(violations) != 0:
+        print("Start-up budget exceeded:")
+        for violation in violations:
+            print("    " + violation)
+        sys.exit(1)
+    print("Every core import within %.3g s and free of %s" % (args.budget, ", ".join(heavy_modules)))